@@ -0,0 +1,85 @@
+from config import AVAILABILITY_INDEX, AVAILABILITY_TTL, METADATA_BATCH
+from session import write_atomic, read_json
+from scheduler import BACKGROUND
+from concurrent.futures import wait
+import json
+import threading
+import time
+
+class AvailabilityIndex:
+    # whether each track could be played when it was last checked, so next() and
+    # prefetch can step over deleted, private or blocked videos without asking
+    def __init__(self, sources, path=AVAILABILITY_INDEX, ttl=AVAILABILITY_TTL):
+        self.sources = sources
+        self.path = path
+        self.ttl = ttl
+        # id -> [available, checked_at]
+        self.checked = read_json(path) or {}
+        self.dead = {track_id for track_id, (ok, _) in self.checked.items() if not ok}
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def is_dead(self, item):
+        return item['id'] in self.dead
+
+    def validate(self, items):
+        now = time.time()
+        groups = {}
+        seen = set()
+        for item in items:
+            entry = self.checked.get(item['id'])
+            if item['id'] in seen or (entry and now - entry[1] < self.ttl):
+                continue
+            seen.add(item['id'])
+            groups.setdefault(self.sources.for_item(item), []).append(item)
+        futures = []
+        for source, group in groups.items():
+            for i in range(0, len(group), METADATA_BATCH):
+                batch = group[i:i + METADATA_BATCH]
+                # the source's scheduler bounds how many run at once, and anything the user does goes first
+                future = source.submit(source.available, batch, priority=BACKGROUND)
+                future.add_done_callback(lambda f, batch=batch: self._checked(batch, f))
+                futures.append(future)
+        if futures:
+            threading.Thread(target=self._save_after, args=(futures,), daemon=True).start()
+        return len(seen)
+
+    def _checked(self, batch, future):
+        if future.exception() is not None:
+            # unknown isn't dead, the next load asks again
+            return
+        available = future.result()
+        now = time.time()
+        with self.lock:
+            for item in batch:
+                self._set(item['id'], item['id'] in available, now)
+            self.version += 1
+
+    def _set(self, track_id, ok, now):
+        self.checked[track_id] = [ok, now]
+        if ok:
+            self.dead.discard(track_id)
+        else:
+            self.dead.add(track_id)
+
+    def mark(self, item, ok):
+        # what playback found out, only written when it changes the verdict
+        if ok and item['id'] not in self.dead:
+            return
+        with self.lock:
+            self._set(item['id'], ok, time.time())
+            self.version += 1
+        self.save()
+
+    def _save_after(self, futures):
+        wait(futures)
+        self.save()
+
+    def save(self):
+        now = time.time()
+        with self.lock:
+            # expired verdicts get checked again anyway, dropping them keeps the file bounded
+            self.checked = {k: v for k, v in self.checked.items() if now - v[1] < self.ttl}
+            self.dead &= self.checked.keys()
+            data = json.dumps(self.checked)
+        write_atomic(self.path, data)
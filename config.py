@@ -1,2 +1,94 @@
 # Any config constants or utility functions
-PLAYLISTS_DIR = "playlists"
\ No newline at end of file
+PLAYLISTS_DIR = "playlists"
+IMPORT_PREFETCH = 4
+METRICS_EXPORT_PATH = "metrics.jsonl"
+RESOLVE_RETRIES = 3
+RESOLVE_BACKOFF = 0.5
+RESOLVE_FORMATS = ["bestaudio/best", "bestaudio[ext=m4a]/bestaudio[ext=webm]", "best"]
+CIRCUIT_FAILURES = 5
+CIRCUIT_COOLDOWN = 30
+# "auto" picks a profile from measured throughput, see ADAPTIVE_TIERS
+AUDIO_PROFILE = "auto"
+AUDIO_PROFILES = {
+    "high": {"codecs": ["opus", "m4a"], "max_abr": None, "audio_only": True},
+    "balanced": {"codecs": ["opus", "m4a"], "max_abr": 128, "audio_only": True},
+    "low": {"codecs": ["opus", "m4a"], "max_abr": 64, "audio_only": True},
+}
+# (minimum throughput in kbit/s, profile), checked top to bottom
+ADAPTIVE_TIERS = [(1500, "high"), (400, "balanced"), (0, "low")]
+ADAPTIVE_DEFAULT = "balanced"
+LIBRARY_DIRS = ["~/Music"]
+LIBRARY_INDEX = "library.json"
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus", ".ogg", ".flac", ".wav", ".aac", ".webm", ".wma", ".alac")
+# favour tracks with fewer plays when shuffling
+SHUFFLE_WEIGHTED = False
+# upcoming tracks whose stream URLs are resolved ahead of time
+LOOKAHEAD = 2
+SESSION_FILE = "session.json"
+SESSION_QUEUE_FILE = "session_queue.json"
+SESSION_INTERVAL = 10
+HISTORY_FILE = "history.jsonl"
+HISTORY_LIMIT = 1000
+LOUDNESS_NORMALIZE = True
+LOUDNESS_INDEX = "loudness.json"
+# integrated loudness tracks are brought to, in LUFS
+LOUDNESS_TARGET = -14.0
+# limits in dB; boosting quiet uploads too far only adds clipping
+LOUDNESS_MAX_BOOST = 6.0
+LOUDNESS_MAX_CUT = 20.0
+# seconds of a track heard before its integrated loudness is worth keeping
+LOUDNESS_MIN_HEARD = 30
+# per-source (worker threads, calls per second or None, burst)
+SOURCE_LIMITS = {
+    "youtube": (IMPORT_PREFETCH, 4, 8),
+    "local": (2, None, 1),
+    "downloads": (2, None, 1),
+}
+DOWNLOAD_DIR = "downloads"
+METADATA_INDEX = "metadata.json"
+# ids per watch_videos request, YouTube caps these lists at 50
+METADATA_BATCH = 50
+METADATA_SAVE_INTERVAL = 5
+# sqlite file shared by every tuneshell process of one user, e.g. "~/.cache/tuneshell.db";
+# it is created mode 0600 and refused if another user owns it or can open it.
+# None keeps all caches per process. TUNESHELL_SHARED_CACHE overrides it.
+SHARED_CACHE_PATH = None
+SHARED_CACHE_LEASE = 30
+SHARED_CACHE_MMAP = 64 * 1024 * 1024
+# stream URLs read back from the shared cache must be https on one of these hosts
+SHARED_STREAM_HOSTS = (".googlevideo.com",)
+SEARCH_CACHE_TTL = 600
+METADATA_CACHE_TTL = 7 * 24 * 3600
+# ids a successful metadata request had nothing for are asked about again after this
+METADATA_MISSING_TTL = 3600
+THEMES_DIR = "themes"
+THEME = "vintage"
+VISUALIZER_FPS = 15
+VISUALIZER_BANDS = 24
+HEAD_PREFETCH = True
+# first bytes of each upcoming stream kept locally, about 13 s of 160 kbit/s audio
+HEAD_BYTES = 256 * 1024
+HEAD_CACHE_BYTES = 16 * 1024 * 1024
+# per-mode key bindings that replace or extend the defaults in keymap.py
+KEYMAP_FILE = "keymap.json"
+# YouTube Data API root for playlist sync, point it at development/fakes/youtube_api.py to test offline
+YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
+# OAuth credentials as saved by google-auth, TUNESHELL_YOUTUBE_TOKEN overrides the access token
+YOUTUBE_TOKEN_FILE = "token.json"
+# played smart fill tracks kept behind the current one, older ones drop out of the queue
+FILL_KEEP_PLAYED = 25
+# resolved stream URLs held in memory, expired ones are dropped first
+RESOLVE_CACHE_SIZE = 500
+# tracks kept in metadata.json and loudness.json, the oldest entries go first
+METADATA_CACHE_SIZE = 20000
+LOUDNESS_INDEX_SIZE = 20000
+AVAILABILITY_INDEX = "availability.json"
+# how long a playable/unavailable verdict is trusted before the track is checked again
+AVAILABILITY_TTL = 24 * 3600
+# queue edits that can be undone
+UNDO_LIMIT = 500
+# search results are fetched a page at a time as the selection nears the end of the list;
+# YouTube answers about 20 per request, so a smaller page wouldn't come back any sooner
+SEARCH_PAGE_SIZE = 20
+# queries whose fetched pages are kept, so searching one again doesn't refetch it
+SEARCH_PAGE_CACHE = 20
\ No newline at end of file
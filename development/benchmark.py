@@ -0,0 +1,230 @@
+# Benchmarks tuneshell's hot paths against local stand-ins for yt-dlp and
+# mpv (see fakes/), so it runs offline and without OAuth.
+#
+#   python development/benchmark.py [--latency 0.05] [--fail-rate 0] [--out FILE]
+#
+# Each run appends one JSON record to the output file and prints the change
+# against the previous record, so regressions show up across commits.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+FAKES = os.path.join(HERE, "fakes")
+
+sys.path[:0] = [FAKES, ROOT]
+os.environ["PATH"] = FAKES + os.pathsep + os.environ["PATH"]
+
+class FakeScreen:
+    def __init__(self, height=40, width=120):
+        self.height = height
+        self.width = width
+        self.lines = {}
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, y, x, text, *attr):
+        self.lines[y] = text
+
+    def erase(self):
+        self.lines = {}
+
+    clear = erase
+
+    def refresh(self):
+        pass
+
+    def timeout(self, delay):
+        pass
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def read_events(path):
+    events = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                event, ts, url = line.split(" ", 2)
+                events.append((event, float(ts), url.strip()))
+    return events
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.001)
+    raise TimeoutError("benchmark step timed out")
+
+def tracks(n, prefix="track"):
+    return [{"title": f"{prefix} {i}", "id": f"{prefix}{i:07d}", "url": f"https://www.youtube.com/watch?v={prefix}{i:07d}"}
+            for i in range(n)]
+
+def bench_playback(log_path):
+    from player import MusicPlayer
+    os.environ["FAKE_MPV_DURATION"] = "0.3"
+    player = MusicPlayer()
+    player.add_multiple_to_queue(tracks(3))
+    started = time.time()
+    player.play(0)
+    first = wait_for(lambda: [e for e in read_events(log_path) if e[0] == "start"])
+    time_to_first_audio = first[0][1] - started
+    starts = wait_for(lambda: [e for e in read_events(log_path) if e[0] == "start"][1:] or None)
+    end = [e for e in read_events(log_path) if e[0] == "end"][0]
+    player.stop()
+    return {
+        "time_to_first_audio_ms": round(time_to_first_audio * 1000, 2),
+        "track_switch_gap_ms": round((starts[0][1] - end[1]) * 1000, 2),
+    }
+
+def bench_search_render():
+    from ui import NcursesUI
+    screen = FakeScreen()
+    ui = NcursesUI(screen)
+    ui.mode = "search"
+    started = time.time()
+    ui.searcher.search("benchmark query")
+
+    def rendered():
+        ui.draw()
+        return any(y >= 2 and "result" in text for y, text in screen.lines.items())
+
+    wait_for(rendered)
+    first = time.time() - started
+    wait_for(lambda: not ui.searcher.searching)
+    ui.draw()
+    return {"search_first_render_ms": round(first * 1000, 2),
+            "search_complete_ms": round((time.time() - started) * 1000, 2)}
+
+def bench_autosave(sizes):
+    from player import MusicPlayer
+    results = {}
+    for n in sizes:
+        player = MusicPlayer()
+        player.add_multiple_to_queue(tracks(n))
+        player.set_playlist_name(f"bench_{n}")
+        started = time.perf_counter()
+        player.save_current_playlist()
+        results[str(n)] = round((time.perf_counter() - started) * 1000, 3)
+    return results
+
+def bench_draw_queue(sizes, frames=50):
+    from ui import NcursesUI
+    results = {}
+    for n in sizes:
+        ui = NcursesUI(FakeScreen())
+        ui.player.add_multiple_to_queue(tracks(n))
+        ui.mode = "queue"
+        ui.queue_selected = n // 2
+        started = time.perf_counter()
+        for _ in range(frames):
+            ui.draw()
+        results[str(n)] = round((time.perf_counter() - started) * 1000 / frames, 3)
+    return results
+
+def bench_key_repeat(n=10000, held=120):
+    # a held key as it arrives within one frame: KEY_DOWN auto-repeat, then Z with autosave on
+    import curses
+    from ui import NcursesUI
+    ui = NcursesUI(FakeScreen())
+    ui.player.add_multiple_to_queue(tracks(n))
+    ui.player.playlist_name = "bench-keys"
+    ui.player.auto_save = True
+    ui.mode = "queue"
+    started = time.perf_counter()
+    ui.process_keys([curses.KEY_DOWN] * held + [ord('Z')] * held)
+    ui.draw()
+    return {"key_burst_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+def bench_sync(size=5000, changes=3):
+    # resync of a large playlist after a few remote and local edits, against the API stand-in
+    from youtube_api import FakeYouTubeApi
+    from playlist import load_playlist, save_playlist
+    from ytsync import YouTubeApi, sync_playlist
+    fake = FakeYouTubeApi().start()
+    fake.create("PLbench", size)
+    client = YouTubeApi(base=fake.base, token_file="token.json")
+    started = time.perf_counter()
+    sync_playlist("bench-sync", "PLbench", client)
+    full = time.perf_counter() - started
+    for n in range(changes):
+        fake.insert("PLbench", f"new{n}")
+    local = load_playlist("bench-sync")
+    save_playlist("bench-sync", local[:-1] + [{'title': 'Local add', 'id': 'local0', 'url': 'https://www.youtube.com/watch?v=local0'}])
+    requests = fake.requests
+    started = time.perf_counter()
+    sync_playlist("bench-sync", "PLbench", client)
+    resync = time.perf_counter() - started
+    fake.stop()
+    return {"sync_full_ms": round(full * 1000, 1), "sync_incremental_ms": round(resync * 1000, 1),
+            "sync_incremental_requests": fake.requests - requests}
+
+def compare(previous, current, prefix=""):
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict):
+            compare(old or {}, value, f"{prefix}{key}.")
+        elif isinstance(old, (int, float)) and old:
+            print(f"  {prefix}{key}: {old} -> {value} ({(value - old) / old:+.0%})")
+        else:
+            print(f"  {prefix}{key}: {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="tuneshell benchmark harness")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake yt-dlp extraction latency (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fake yt-dlp failure probability")
+    parser.add_argument("--mpv-startup", type=float, default=0.05, help="fake mpv startup delay (s)")
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="queue sizes to measure")
+    parser.add_argument("--out", default=os.path.join(HERE, "bench_results.jsonl"))
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.sizes.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="tuneshell-bench-")
+    os.chdir(workdir)
+    log_path = os.path.join(workdir, "mpv.log")
+    os.environ.update({
+        "FAKE_YTDLP_LATENCY": str(args.latency),
+        "FAKE_YTDLP_FAIL_RATE": str(args.fail_rate),
+        "FAKE_MPV_STARTUP": str(args.mpv_startup),
+        "FAKE_MPV_LOG": log_path,
+    })
+
+    results = {}
+    results.update(bench_playback(log_path))
+    results.update(bench_search_render())
+    results["autosave_ms"] = bench_autosave(sizes)
+    results["draw_queue_ms"] = bench_draw_queue(sizes)
+    results.update(bench_key_repeat())
+    results.update(bench_sync())
+
+    record = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"latency": args.latency, "fail_rate": args.fail_rate, "mpv_startup": args.mpv_startup},
+        "results": results,
+    }
+    previous = None
+    if os.path.exists(args.out):
+        with open(args.out) as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            previous = json.loads(lines[-1])
+    with open(args.out, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(f"benchmark @ {record['commit']}" + (f" (vs {previous['commit']})" if previous else ""))
+    compare(previous["results"] if previous else {}, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# Stand-in for the parts of the YouTube Data API v3 that ytsync.py talks to:
+# playlistItems list (paged, with ETags and If-None-Match), insert and delete.
+#
+#   python development/fakes/youtube_api.py [--port 8765] [--size 5000] [--playlist PL1]
+#
+# then set YOUTUBE_API_BASE = "http://127.0.0.1:8765/youtube/v3" in config.py.
+#   FAKE_API_LATENCY  seconds added to every request (default 0)
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+LATENCY = float(os.environ.get("FAKE_API_LATENCY", "0"))
+
+def _etag(value):
+    return '"' + hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:20] + '"'
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _route(self):
+        time.sleep(LATENCY)
+        url = urlparse(self.path)
+        self.server.api.requests += 1
+        return url.path.rstrip("/").rpartition("/")[2], {k: v[0] for k, v in parse_qs(url.query).items()}
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("ETag", body.get("etag", ""))
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        resource, params = self._route()
+        api = self.server.api
+        if resource != "playlistItems" or params.get("playlistId") not in api.playlists:
+            self._send(404, {"error": {"code": 404}})
+            return
+        body = api.page(params["playlistId"], int(params.get("pageToken") or 0), int(params.get("maxResults", 5)))
+        if self.headers.get("If-None-Match") == body["etag"]:
+            api.not_modified += 1
+            self._send(304)
+        else:
+            self._send(200, body)
+
+    def do_POST(self):
+        resource, params = self._route()
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        snippet = request.get("snippet", {})
+        if resource != "playlistItems" or snippet.get("playlistId") not in self.server.api.playlists:
+            self._send(404, {"error": {"code": 404}})
+            return
+        item = self.server.api.insert(snippet["playlistId"], snippet["resourceId"]["videoId"])
+        self._send(200, self.server.api.resource(item, None))
+
+    def do_DELETE(self):
+        resource, params = self._route()
+        if resource != "playlistItems" or not self.server.api.delete(params.get("id")):
+            self._send(404, {"error": {"code": 404}})
+            return
+        self._send(204)
+
+class FakeYouTubeApi:
+    def __init__(self, port=0):
+        self.playlists = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.server.api = self
+
+    @property
+    def base(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/youtube/v3"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def create(self, playlist_id, size):
+        self.playlists[playlist_id] = []
+        for n in range(size):
+            self.insert(playlist_id, f"vid{n:06d}", f"Remote track {n}")
+
+    def insert(self, playlist_id, video_id, title=None):
+        with self.lock:
+            item = {"id": f"PLI{next(self.ids)}", "videoId": video_id, "title": title or f"Video {video_id}"}
+            self.playlists[playlist_id].append(item)
+            return item
+
+    def delete(self, item_id):
+        with self.lock:
+            for items in self.playlists.values():
+                for i, item in enumerate(items):
+                    if item["id"] == item_id:
+                        del items[i]
+                        return True
+        return False
+
+    def resource(self, item, position):
+        snippet = {"title": item["title"], "position": position,
+                   "resourceId": {"kind": "youtube#video", "videoId": item["videoId"]}}
+        return {"kind": "youtube#playlistItem", "etag": _etag([item, position]), "id": item["id"], "snippet": snippet}
+
+    def page(self, playlist_id, offset, size):
+        with self.lock:
+            items = self.playlists[playlist_id]
+            chunk = [self.resource(item, offset + i) for i, item in enumerate(items[offset:offset + size])]
+            total = len(items)
+        body = {"kind": "youtube#playlistItemListResponse", "items": chunk,
+                "pageInfo": {"totalResults": total, "resultsPerPage": size}}
+        if offset + size < total:
+            body["nextPageToken"] = str(offset + size)
+        body["etag"] = _etag(body)
+        return body
+
+def main():
+    parser = argparse.ArgumentParser(description="YouTube Data API stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--playlist", default="PL1")
+    args = parser.parse_args()
+    api = FakeYouTubeApi(args.port)
+    api.create(args.playlist, args.size)
+    print(f"serving {args.playlist} ({args.size} items) at {api.base}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Local stand-in for yt-dlp used by the benchmark and soak harnesses.
+# Behaviour is driven by environment variables so subprocesses see the
+# same settings:
+#   FAKE_YTDLP_LATENCY        seconds per extraction (default 0.05)
+#   FAKE_YTDLP_PAGE_LATENCY   seconds per 100 playlist entries (default 0.02)
+#   FAKE_YTDLP_FAIL_RATE      probability an extraction raises (default 0)
+#   FAKE_YTDLP_PLAYLIST_SIZE  entries in any playlist URL (default 500)
+#   FAKE_YTDLP_STREAM_BASE    prefix for resolved stream URLs
+#   FAKE_YTDLP_DEAD_RATE      share of video ids that are deleted/private (default 0)
+import hashlib
+import itertools
+import os
+import random
+import time
+from urllib.parse import parse_qs, urlparse
+
+from .utils import DownloadError
+
+__all__ = ['YoutubeDL', 'DownloadError']
+
+def _env(name, default):
+    return type(default)(os.environ.get(name, default))
+
+def _video_id(seed):
+    return hashlib.sha1(seed.encode()).hexdigest()[:11]
+
+def _dead(video_id):
+    # decided by the id, so every process agrees on which videos are gone
+    return int(hashlib.sha1(video_id.encode()).hexdigest()[:8], 16) / 2 ** 32 < _env('FAKE_YTDLP_DEAD_RATE', 0.0)
+
+def _flat(video_id, title):
+    return {
+        '_type': 'url',
+        'ie_key': 'Youtube',
+        'id': video_id,
+        'title': title,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': 180 + sum(map(ord, video_id)) % 120,
+        'channel': f"Channel {video_id[:2]}",
+    }
+
+class YoutubeDL:
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _wait(self):
+        time.sleep(_env('FAKE_YTDLP_LATENCY', 0.05))
+        if random.random() < _env('FAKE_YTDLP_FAIL_RATE', 0.0):
+            raise DownloadError("ERROR: fake extraction failure")
+
+    def _search(self, query, count):
+        self._wait()
+        entries = [_flat(_video_id(f"{query}/{i}"), f"{query} result {i}") for i in range(count)]
+        start = self.params.get('playliststart', 1) - 1
+        end = self.params.get('playlistend') or count
+        return {'_type': 'playlist', 'id': query, 'title': query, 'entries': entries[start:end]}
+
+    def _lazy_search(self, query):
+        # what process=False hands back: entries come in continuations of 20,
+        # each one a request of its own when the generator reaches it
+        def entries():
+            for i in itertools.count():
+                if i % 20 == 0:
+                    self._wait()
+                yield _flat(_video_id(f"{query}/{i}"), f"{query} result {i}")
+
+        return {'_type': 'playlist', 'id': query, 'title': query, 'entries': entries()}
+
+    def _playlist(self, list_id):
+        size = _env('FAKE_YTDLP_PLAYLIST_SIZE', 500)
+        page_latency = _env('FAKE_YTDLP_PAGE_LATENCY', 0.02)
+
+        def entries():
+            for i in range(size):
+                if i % 100 == 0:
+                    time.sleep(page_latency)
+                yield _flat(_video_id(f"{list_id}/{i}"), f"{list_id} track {i}")
+
+        self._wait()
+        return {'_type': 'playlist', 'id': list_id, 'title': list_id, 'entries': entries()}
+
+    def _video(self, video_id):
+        self._wait()
+        if _dead(video_id):
+            raise DownloadError(f"ERROR: [youtube] {video_id}: Video unavailable")
+        base = os.environ.get('FAKE_YTDLP_STREAM_BASE', 'http://127.0.0.1:1/stream')
+        formats = [
+            {'format_id': '251', 'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none', 'abr': 130,
+             'url': f"{base}/{video_id}.webm"},
+            {'format_id': '140', 'ext': 'm4a', 'acodec': 'mp4a.40.2', 'vcodec': 'none', 'abr': 128,
+             'url': f"{base}/{video_id}.m4a"},
+            {'format_id': '18', 'ext': 'mp4', 'acodec': 'mp4a.40.2', 'vcodec': 'avc1', 'tbr': 500,
+             'url': f"{base}/{video_id}.mp4"},
+        ]
+        return dict(_flat(video_id, f"Video {video_id}"), _type='video', url=formats[0]['url'],
+                    formats=formats, upload_date='20240101')
+
+    def extract_info(self, url, download=False, process=True):
+        if url.startswith('ytsearch'):
+            prefix, _, query = url.partition(':')
+            if not process:
+                return self._lazy_search(query)
+            count = int(prefix[len('ytsearch'):] or 1)
+            return self._search(query, count)
+        parsed = urlparse(url)
+        params = parse_qs(parsed.query)
+        if parsed.netloc == 'music.youtube.com' and parsed.path == '/search':
+            if not process:
+                return self._lazy_search(params['q'][0])
+            return self._search(params['q'][0], self.params.get('playlistend') or 20)
+        if 'list' in params:
+            return self._playlist(params['list'][0])
+        if 'video_ids' in params:
+            try:
+                self._wait()
+            except DownloadError:
+                # like yt-dlp, ignoreerrors reports a failed extraction as None
+                if self.params.get('ignoreerrors'):
+                    return None
+                raise
+            ids = params['video_ids'][0].split(',')
+            return {'_type': 'playlist', 'id': 'TL', 'entries': [_flat(i, f"Video {i}") for i in ids if not _dead(i)]}
+        if 'v' in params:
+            return self._video(params['v'][0])
+        return self._video(_video_id(url))
@@ -0,0 +1,158 @@
+# Replays days of listening (plays, skips, pauses, searches, smart fill) against
+# the stand-ins in fakes/ and reports whether memory, threads and object counts
+# stay flat.
+#
+#   python development/soak.py [--days 3] [--tracks-per-day 200] [--seed 1] [--max-growth-kb 256]
+#
+# Time is compressed: a day is its tracks played back to back with short fake
+# mpv runs, since memory grows per event rather than per hour. The first day is
+# warm-up; growth is measured over the days after it and the run exits non-zero
+# when traced memory grows faster than --max-growth-kb per day.
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+FAKES = os.path.join(HERE, "fakes")
+
+sys.path[:0] = [FAKES, ROOT]
+os.environ["PATH"] = FAKES + os.pathsep + os.environ["PATH"]
+
+WORDS = ["lofi", "jazz", "ambient", "piano", "synthwave", "live", "acoustic", "remix", "cover", "mix"]
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    # peak rather than current, but still shows a leak
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+def sample(player, tracks, tracks_per_day):
+    gc.collect()
+    return {
+        "day": tracks / tracks_per_day,
+        "tracks": tracks,
+        "rss_kb": rss_kb(),
+        "traced_kb": tracemalloc.get_traced_memory()[0] // 1024,
+        "threads": threading.active_count(),
+        "objects": len(gc.get_objects()),
+        "queue": len(player.queue),
+        "resolving": len(player.resolving),
+        "resolver_cache": len(player.resolver.cache),
+    }
+
+def step(player, searcher, rng):
+    roll = rng.random()
+    if roll < 0.1:
+        searcher.search(f"{rng.choice(WORDS)} {rng.randrange(1000)}")
+        wait_for(lambda: not searcher.searching)
+        if searcher.results and rng.random() < 0.5:
+            player.add_to_queue(dict(searcher.results[0]))
+        return False
+    if roll < 0.2 and player.is_playing:
+        player.pause()
+        time.sleep(0.02)
+        player.resume()
+        return False
+    if roll < 0.6:
+        player.next()
+        return True
+    # let the track run out and smart fill or the queue pick the next one
+    process = player.process
+    wait_for(lambda: player.process is not process and player.process is not None)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="tuneshell soak harness")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--tracks-per-day", type=int, default=200)
+    parser.add_argument("--samples-per-day", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-growth-kb", type=int, default=256, help="allowed traced memory growth per day")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="tuneshell-soak-"))
+    os.environ.update({
+        "FAKE_YTDLP_LATENCY": "0.002",
+        "FAKE_MPV_STARTUP": "0.01",
+        "FAKE_MPV_DURATION": "0.15",
+        "FAKE_FFMPEG_LATENCY": "0.01",
+    })
+    import config
+    # the stand-ins answer in milliseconds, YouTube's call rate limit would only stretch the run
+    config.SOURCE_LIMITS = dict(config.SOURCE_LIMITS, youtube=(config.IMPORT_PREFETCH, None, 1))
+    # smaller limits than a real install, so the caches fill up during the warm-up day
+    config.HISTORY_LIMIT = 100
+    config.RESOLVE_CACHE_SIZE = 100
+    config.METADATA_CACHE_SIZE = config.LOUDNESS_INDEX_SIZE = 150
+    config.UNDO_LIMIT = 50
+    tracemalloc.start()
+    from player import MusicPlayer
+    from search import default_pipeline
+    from youtube import search_youtube
+
+    player = MusicPlayer()
+    searcher = default_pipeline(player)
+    player.add_multiple_to_queue(search_youtube("soak seed", 20))
+    player.playlist_name = "soak"
+    player.auto_save = True
+    player.smart_fill_enabled = True
+    player.session.start(player)
+    player.play(0)
+
+    rng = random.Random(args.seed)
+    every = max(1, args.tracks_per_day // args.samples_per_day)
+    samples = [sample(player, 0, args.tracks_per_day)]
+    baseline = None
+    tracks = 0
+    started = time.monotonic()
+    while tracks < args.days * args.tracks_per_day:
+        if step(player, searcher, rng):
+            tracks += 1
+            if tracks % every == 0:
+                samples.append(sample(player, tracks, args.tracks_per_day))
+                s = samples[-1]
+                print(f"day {s['day']:5.2f}  rss {s['rss_kb'] / 1024:6.1f} MB  traced {s['traced_kb'] / 1024:6.2f} MB  "
+                      f"threads {s['threads']:3d}  objects {s['objects']:7d}  queue {s['queue']:4d}  "
+                      f"resolving {s['resolving']:3d}  resolver cache {s['resolver_cache']:4d}", flush=True)
+            if tracks == args.tracks_per_day:
+                baseline = (samples[-1], tracemalloc.take_snapshot())
+    player.stop()
+    print(f"{tracks} tracks in {time.monotonic() - started:.0f}s")
+
+    if baseline is None or args.days < 2:
+        return
+    first, snapshot = baseline
+    last = samples[-1]
+    days = last["day"] - first["day"]
+    growth = (last["traced_kb"] - first["traced_kb"]) / days
+    print(f"after warm-up, per day: traced {growth:+.0f} KB, rss {(last['rss_kb'] - first['rss_kb']) / days:+.0f} KB, "
+          f"objects {(last['objects'] - first['objects']) / days:+.0f}, threads {first['threads']} -> {last['threads']}")
+    print("largest growth by line:")
+    for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:10]:
+        print(f"  {stat}")
+    if growth > args.max_growth_kb:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import compress
+import threading
+
+_EMPTY = frozenset()
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def matches(query, title):
+    title = title.lower()
+    return all(word in title for word in query.lower().split())
+
+def _add(docs, grams, item):
+    key = id(item)
+    doc = docs.get(key)
+    if doc:
+        doc[2] += 1
+        return
+    title = item['title'].lower()
+    docs[key] = [title, item, 1]
+    for gram in trigrams(title):
+        grams[gram].add(key)
+
+def _remove(docs, grams, item):
+    key = id(item)
+    doc = docs.get(key)
+    if not doc:
+        return
+    doc[2] -= 1
+    if doc[2]:
+        return
+    del docs[key]
+    for gram in trigrams(doc[0]):
+        keys = grams.get(gram)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del grams[gram]
+
+class TitleIndex:
+    # keyed by object identity so equal tracks queued twice stay distinct rows
+    def __init__(self, items=()):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.generation = 0
+        # edits made while a rebuild runs, replayed onto the new index before it's swapped in
+        self.journal = None
+        self.grams = defaultdict(set)
+        self.docs = {}
+        self.reset(items)
+
+    def reset(self, items=()):
+        self._build(self._begin(), items)
+
+    def rebuild(self, items):
+        # indexing a big playlist takes a while: it's built on a thread and swapped in,
+        # searches meanwhile see the old index instead of waiting on the lock
+        threading.Thread(target=self._build, args=(self._begin(), items), daemon=True).start()
+
+    def _begin(self):
+        with self.lock:
+            self.generation += 1
+            self.journal = []
+            return self.generation
+
+    def _build(self, generation, items):
+        docs, grams = {}, defaultdict(set)
+        for item in items:
+            _add(docs, grams, item)
+        with self.lock:
+            if generation != self.generation:
+                # a newer reset took over
+                return
+            for added, item in self.journal:
+                (_add if added else _remove)(docs, grams, item)
+            self.docs, self.grams = docs, grams
+            self.journal = None
+            self.version += 1
+
+    def add(self, item):
+        with self.lock:
+            self.version += 1
+            _add(self.docs, self.grams, item)
+            if self.journal is not None:
+                self.journal.append((True, item))
+
+    def remove(self, item):
+        with self.lock:
+            self.version += 1
+            _remove(self.docs, self.grams, item)
+            if self.journal is not None:
+                self.journal.append((False, item))
+
+    def search(self, query, within=None):
+        with self.lock:
+            return self._search(query, within)
+
+    def _search(self, query, within):
+        keys = within
+        # longest words first, they have the most selective trigrams
+        for word in sorted(query.lower().split(), key=len, reverse=True):
+            if len(word) >= 3:
+                sets = sorted((self.grams.get(g, _EMPTY) for g in trigrams(word)), key=len)
+                if keys is not None:
+                    sets.insert(0, keys)
+                    sets.sort(key=len)
+                candidates = set(sets[0]).intersection(*sets[1:])
+            else:
+                candidates = self.docs.keys() if keys is None else keys
+            if len(word) == 3 or (len(word) > 3 and 2 * len(candidates) > len(self.docs)):
+                # a three letter word is its own trigram; for longer ones a title with
+                # every piece but not the word is rare, and checking most of the index
+                # is what makes a broad query slow
+                keys = candidates
+                continue
+            # trigrams only prove the pieces are there, check the whole word
+            docs = self.docs
+            keys = {k for k in candidates if word in docs[k][0]}
+        return set(self.docs) if keys is None else keys
+
+class IncrementalFilter:
+    def __init__(self, index):
+        self.index = index
+        self.query = None
+        self.keys = None
+        self.version = None
+
+    def update(self, query):
+        # a query that extends the previous one can only narrow its matches
+        narrowing = (self.query is not None and query.startswith(self.query)
+                     and self.version == self.index.version)
+        self.keys = self.index.search(query, self.keys if narrowing else None)
+        self.query = query
+        self.version = self.index.version
+        return self.keys
+
+def positions(items, keys):
+    # rows of items whose identity is in keys, kept in C loops for big queues
+    return list(compress(range(len(items)), map(keys.__contains__, map(id, items))))
+
+def step(rows, current, delta):
+    # rows are sorted indices of the visible items, current may be hidden
+    if not rows:
+        return current
+    pos = bisect_left(rows, current)
+    if pos < len(rows) and rows[pos] == current:
+        pos += delta
+    elif delta < 0:
+        pos += delta
+    else:
+        pos += max(0, delta - 1)
+    return rows[max(0, min(len(rows) - 1, pos))]
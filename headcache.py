@@ -0,0 +1,226 @@
+from config import HEAD_BYTES, HEAD_CACHE_BYTES
+from metrics import metrics
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import re
+import socket
+import struct
+import threading
+import urllib.error
+import urllib.request
+
+CHUNK = 64 * 1024
+TIMEOUT = 15
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+# statuses meaning the stream URL itself is dead, not just a network hiccup
+EXPIRED_STATUSES = (403, 404, 410)
+# proxy URLs handed out and still answered, the oldest are forgotten first
+MAX_TOKENS = 64
+
+class RemoteError(Exception):
+    # the stream side of the proxy failed, as opposed to mpv hanging up
+    def __init__(self, error, status=None):
+        super().__init__(str(error))
+        self.status = status
+
+class Head:
+    def __init__(self, data, total, content_type):
+        self.data = data
+        self.total = total
+        self.content_type = content_type
+
+def _fetch_head(url, size):
+    request = urllib.request.Request(url, headers={'Range': f"bytes=0-{size - 1}"})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+        data = response.read(size)
+        if response.status == 206:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        else:
+            total = response.headers.get('Content-Length')
+        content_type = response.headers.get('Content-Type', 'application/octet-stream')
+    return Head(data, int(total) if total and total.isdigit() else None, content_type)
+
+def _open_remote(url, range_header):
+    request = urllib.request.Request(url, headers={'Range': range_header} if range_header else {})
+    try:
+        return urllib.request.urlopen(request, timeout=TIMEOUT)
+    except urllib.error.HTTPError as e:
+        raise RemoteError(e, e.code) from e
+    except (OSError, HTTPException) as e:
+        raise RemoteError(e) from e
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cache = self.server.cache
+        url = cache.tokens.get(self.path.rpartition('/')[2])
+        if url is None:
+            self.send_error(404)
+            return
+        match = RANGE.match(self.headers.get('Range', ''))
+        start = int(match.group(1)) if match else 0
+        head = cache.get(url)
+        self.answered = False
+        try:
+            if head is None or start >= len(head.data) or (match and match.group(2)):
+                # seeks past the head and bounded ranges just pass through
+                self._relay(url, cache, self.headers.get('Range'))
+            else:
+                self._send_head(url, cache, head, start, bool(match))
+        except RemoteError as e:
+            self._fail(url, cache, e)
+        except (BrokenPipeError, ConnectionResetError):
+            # mpv drops the connection whenever it seeks
+            pass
+
+    def _fail(self, url, cache, error):
+        # the player resumes marked streams from a fresh URL once mpv gives up on this one
+        metrics.miss('head_remote')
+        if self.answered or error.status is None or error.status in EXPIRED_STATUSES:
+            cache.expired.add(url)
+        if not self.answered:
+            self.send_error(error.status or 502)
+            return
+        # the headers promised more, so reset instead of closing: mpv then sees a
+        # failed read it can retry rather than a clean end of the track
+        self.close_connection = True
+        try:
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        except OSError:
+            pass
+
+    def _start(self, status):
+        self.send_response(status)
+        self.answered = True
+
+    def _send_head(self, url, cache, head, start, ranged):
+        self._start(206 if ranged else 200)
+        self.send_header('Content-Type', head.content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        if head.total is not None:
+            self.send_header('Content-Length', str(head.total - start))
+            if ranged:
+                self.send_header('Content-Range', f"bytes {start}-{head.total - 1}/{head.total}")
+        self.end_headers()
+        metrics.hit('head_cache')
+        self.wfile.write(head.data[start:])
+        if head.total is not None and len(head.data) >= head.total:
+            return
+        # the head is playing by now, so the remote connection's setup no longer shows
+        with _open_remote(url, f"bytes={len(head.data)}-") as remote:
+            if remote.status == 200:
+                # the server ignored the range, skip what was already sent
+                self._read(remote, len(head.data))
+            self._copy(remote)
+        metrics.hit('head_remote')
+
+    def _relay(self, url, cache, range_header):
+        metrics.miss('head_cache')
+        with _open_remote(url, range_header) as remote:
+            self._start(remote.status)
+            for name in ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges'):
+                if remote.headers.get(name):
+                    self.send_header(name, remote.headers[name])
+            self.end_headers()
+            self._copy(remote)
+        metrics.hit('head_remote')
+
+    def _read(self, remote, size):
+        try:
+            return remote.read(size)
+        except (OSError, HTTPException) as e:
+            raise RemoteError(e) from e
+
+    def _copy(self, remote):
+        while True:
+            chunk = self._read(remote, CHUNK)
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+        if remote.length:
+            # http.client reads a connection closed before Content-Length as a plain end
+            raise RemoteError(f"stream ended {remote.length} bytes early")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # the default prints a traceback, which would land on top of the curses screen
+        metrics.miss('head_proxy')
+
+class HeadCache:
+    # keeps the first HEAD_BYTES of upcoming streams in memory and serves them
+    # to mpv from a loopback proxy that continues with the remote stream
+    def __init__(self, head_bytes=HEAD_BYTES, max_bytes=HEAD_CACHE_BYTES):
+        self.head_bytes = head_bytes
+        self.max_bytes = max_bytes
+        self.heads = OrderedDict()
+        self.size = 0
+        self.tokens = {}
+        self.pending = set()
+        # streams that failed under mpv, expired or just broken; the player re-resolves these
+        self.expired = set()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.server = None
+
+    def _start_server(self):
+        # only listen once there is something to serve
+        with self.lock:
+            if self.server is None:
+                self.server = _Server(('127.0.0.1', 0), _Handler)
+                self.server.cache = self
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def get(self, url):
+        with self.lock:
+            head = self.heads.get(url)
+            if head is not None:
+                self.heads.move_to_end(url)
+            return head
+
+    def prefetch(self, url):
+        if not url.startswith(('http://', 'https://')):
+            return
+        with self.lock:
+            if url in self.heads or url in self.pending:
+                return
+            self.pending.add(url)
+        self.pool.submit(self._prefetch, url)
+
+    def _prefetch(self, url):
+        try:
+            with metrics.timer('head_prefetch'):
+                head = _fetch_head(url, self.head_bytes)
+        except Exception:
+            with self.lock:
+                self.pending.discard(url)
+            return
+        with self.lock:
+            self.pending.discard(url)
+            self.heads[url] = head
+            self.size += len(head.data)
+            while self.size > self.max_bytes and len(self.heads) > 1:
+                _, evicted = self.heads.popitem(last=False)
+                self.size -= len(evicted.data)
+
+    def media_url(self, url):
+        # what mpv should open: the proxy when a head is ready, the stream itself otherwise
+        if self.get(url) is None:
+            return url
+        self._start_server()
+        token = hashlib.sha1(url.encode()).hexdigest()[:16]
+        with self.lock:
+            self.tokens[token] = url
+            if len(self.tokens) > MAX_TOKENS:
+                self.expired.discard(self.tokens.pop(next(iter(self.tokens))))
+        return f"http://127.0.0.1:{self.server.server_address[1]}/head/{token}"
+
+    def is_expired(self, media_url):
+        url = self.tokens.get(media_url.rpartition('/')[2])
+        return url is not None and url in self.expired
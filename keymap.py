@@ -0,0 +1,115 @@
+from config import KEYMAP_FILE
+from session import read_json
+import curses
+
+# key name -> action per mode; "global" applies in every mode unless the mode maps the key itself.
+# Users override or add bindings in KEYMAP_FILE with the same layout, null unbinds a key.
+DEFAULT_KEYMAP = {
+    "global": {
+        "M": "toggle_metrics",
+        "E": "export_metrics",
+        "<": "undo",
+        ">": "redo",
+    },
+    "home": {
+        "A": "add_first",
+        "/": "search",
+        "S": "save_playlist",
+        "O": "open_playlists",
+        "F": "smart_fill",
+        "?": "controls",
+        "L": "show_queue",
+        "Y": "toggle_auto_save",
+        "ESC": "home",
+        "V": "visualizer",
+        "Q": "quit",
+        "SPACE": "play_pause",
+        "KEY_RIGHT": "next",
+        "KEY_LEFT": "prev",
+        "R": "repeat_one",
+        "T": "repeat_queue",
+        "H": "shuffle",
+        "U": "import_playlist",
+        "W": "sync_playlist",
+    },
+    "search": {
+        "KEY_UP": "up",
+        "KEY_DOWN": "down",
+        "KEY_PPAGE": "page_up",
+        "KEY_NPAGE": "page_down",
+        "SPACE": "toggle_select",
+        "ENTER": "add_selected",
+        "ESC": "close",
+        "/": "filter",
+    },
+    "queue": {
+        "KEY_UP": "up",
+        "KEY_DOWN": "down",
+        "KEY_PPAGE": "page_up",
+        "KEY_NPAGE": "page_down",
+        "Z": "move_up",
+        "X": "move_down",
+        "I": "info",
+        "DEL": "remove",
+        "BACKSPACE": "remove",
+        "SPACE": "mark",
+        "V": "mark_range",
+        "P": "play_next",
+        "G": "move_to",
+        "D": "dedupe",
+        "S": "sort",
+        "ENTER": "play_selected",
+        "ESC": "close_queue",
+        "/": "filter",
+    },
+    "control": {
+        "ESC": "home",
+    },
+    "playlist": {
+        "KEY_UP": "up",
+        "KEY_DOWN": "down",
+        "KEY_PPAGE": "page_up",
+        "KEY_NPAGE": "page_down",
+        "ENTER": "load_playlist",
+        "ESC": "close",
+        "/": "filter",
+    },
+    "info": {
+        "ESC": "show_queue",
+    },
+    "visualizer": {
+        "ESC": "close_visualizer",
+    },
+}
+
+NAMED_KEYS = {"ENTER": 10, "ESC": 27, "SPACE": 32, "BACKSPACE": 127, "TAB": 9, "DEL": curses.KEY_DC}
+
+def key_code(name):
+    if name in NAMED_KEYS:
+        return NAMED_KEYS[name]
+    if len(name) == 1:
+        return ord(name)
+    return getattr(curses, name, None)
+
+def load_keymap(path=KEYMAP_FILE):
+    overrides = read_json(path) or {}
+    keymap = {}
+    for mode in DEFAULT_KEYMAP.keys() | overrides.keys():
+        bindings = dict(DEFAULT_KEYMAP.get(mode, {}), **overrides.get(mode, {}))
+        codes = {}
+        for name, action in bindings.items():
+            code = key_code(name)
+            if code is not None and action:
+                codes[code] = action
+        keymap[mode] = codes
+    return keymap
+
+def coalesce(keys):
+    # runs of the same key collapse into (key, count), so auto-repeat costs one action
+    runs = []
+    for key in keys:
+        if runs and runs[-1][0] == key:
+            runs[-1][1] += 1
+        else:
+            runs.append([key, 1])
+    return runs
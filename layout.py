@@ -0,0 +1,61 @@
+from functools import lru_cache
+import unicodedata
+
+ELLIPSIS = "…"
+
+@lru_cache(maxsize=4096)
+def char_width(ch):
+    if unicodedata.combining(ch) or ch in "\u200b\u200c\u200d\u2060\ufe0e\ufe0f":
+        return 0
+    if unicodedata.category(ch) in ("Cc", "Cf"):
+        return 0
+    if unicodedata.east_asian_width(ch) in ("W", "F"):
+        return 2
+    # most emoji are "neutral" in the east asian table but render wide
+    if 0x1F300 <= ord(ch) <= 0x1FAFF or (0x2600 <= ord(ch) <= 0x27BF and unicodedata.category(ch) == "So"):
+        return 2
+    return 1
+
+@lru_cache(maxsize=16384)
+def display_width(text):
+    if text.isascii():
+        return len(text)
+    return sum(char_width(ch) for ch in text)
+
+@lru_cache(maxsize=16384)
+def truncate(text, width):
+    if width <= 0:
+        return ""
+    if display_width(text) <= width:
+        return text
+    used = 0
+    out = []
+    for ch in text:
+        w = char_width(ch)
+        if used + w > width - 1:
+            break
+        out.append(ch)
+        used += w
+    return "".join(out) + ELLIPSIS
+
+class Layout:
+    # row geometry shared by all views: header, filter line, scrolling body,
+    # status line and footer; computed once per terminal size
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.header = 0
+        self.filter = 1
+        self.body_top = 2
+        self.footer = height - 1
+        self.status = height - 2
+        self.body_rows = max(0, self.status - self.body_top)
+        self.overlay_width = min(76, width)
+        self.overlay_x = width - self.overlay_width
+
+    def fits(self, y):
+        return 0 <= y < self.height
+
+@lru_cache(maxsize=8)
+def layout_for(height, width):
+    return Layout(height, width)
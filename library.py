@@ -0,0 +1,139 @@
+from config import LIBRARY_DIRS, LIBRARY_INDEX, AUDIO_EXTENSIONS
+from metrics import metrics
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+# below this many changed files, spinning up worker processes costs more than it saves
+PROCESS_POOL_THRESHOLD = 64
+SAVE_EVERY = 500
+
+def read_tags(path):
+    title = artist = duration = None
+    if mutagen:
+        try:
+            audio = mutagen.File(path, easy=True)
+            if audio is not None:
+                title = (audio.get('title') or [None])[0]
+                artist = (audio.get('artist') or [None])[0]
+                duration = getattr(audio.info, 'length', None)
+        except Exception:
+            pass
+    title = title or os.path.splitext(os.path.basename(path))[0]
+    return path, {'title': f"{artist} - {title}" if artist else title, 'duration': duration}
+
+def local_entry(path, tags, stat):
+    return {
+        'title': tags['title'],
+        'id': "local:" + hashlib.sha1(path.encode()).hexdigest()[:16],
+        'url': path,
+        'path': path,
+        'source': 'local',
+        'duration': tags.get('duration'),
+        'mtime': stat[0],
+        'size': stat[1],
+    }
+
+class Library:
+    def __init__(self, dirs=LIBRARY_DIRS, index_path=LIBRARY_INDEX):
+        self.dirs = [os.path.expanduser(d) for d in dirs]
+        self.index_path = index_path
+        self.tracks = {}
+        self.scanning = False
+        self.status = None
+        self.lock = threading.Lock()
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    self.tracks = json.load(f)
+            except ValueError:
+                self.tracks = {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.tracks)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.index_path)
+
+    def _walk(self):
+        stack = [d for d in self.dirs if os.path.isdir(d)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                            st = entry.stat()
+                            yield entry.path, (st.st_mtime, st.st_size)
+            except OSError:
+                continue
+
+    def scan_async(self):
+        if not self.scanning:
+            self.scanning = True
+            threading.Thread(target=self.scan, daemon=True).start()
+
+    def scan(self):
+        self.scanning = True
+        try:
+            with metrics.timer('library.scan'):
+                self._scan()
+        finally:
+            self.scanning = False
+
+    def _scan(self):
+        seen = {}
+        changed = []
+        for path, stat in self._walk():
+            seen[path] = stat
+            known = self.tracks.get(path)
+            # unchanged mtime and size means the tags we have are still good
+            if not known or known['mtime'] != stat[0] or known['size'] != stat[1]:
+                changed.append(path)
+        removed = [path for path in self.tracks if path not in seen]
+        with self.lock:
+            for path in removed:
+                del self.tracks[path]
+
+        if len(changed) >= PROCESS_POOL_THRESHOLD:
+            pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+            results = pool.map(read_tags, changed, chunksize=32)
+        else:
+            pool = None
+            results = map(read_tags, changed)
+        try:
+            for done, (path, tags) in enumerate(results, 1):
+                with self.lock:
+                    self.tracks[path] = local_entry(path, tags, seen[path])
+                self.status = f"Scanning library... {done}/{len(changed)}"
+                if done % SAVE_EVERY == 0:
+                    self.save()
+        finally:
+            if pool:
+                pool.shutdown()
+        if changed or removed:
+            self.save()
+        self.status = f"Library: {len(self.tracks)} tracks"
+
+    def search(self, query, max_results=10, start=0):
+        words = query.lower().split()
+        with self.lock:
+            tracks = list(self.tracks.values())
+        results = []
+        for track in tracks:
+            if all(w in track['title'].lower() for w in words):
+                results.append(track)
+                if len(results) >= start + max_results:
+                    break
+        return results[start:]
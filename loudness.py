@@ -0,0 +1,46 @@
+from config import LOUDNESS_INDEX, LOUDNESS_TARGET, LOUDNESS_MAX_BOOST, LOUDNESS_MAX_CUT, LOUDNESS_INDEX_SIZE
+from session import write_atomic, read_json
+import json
+import threading
+
+LABEL = "loud"
+# ebur128 only meters, the audio passes through untouched; metadata=1 puts the
+# running integrated loudness on every frame as lavfi.r128.I
+METER = f"@{LABEL}:lavfi=[ebur128=metadata=1]"
+
+def attach_meter(process):
+    # the meter goes into the filter chain of the mpv playing the track, so the
+    # stream is measured as it plays instead of being downloaded a second time.
+    # None while the IPC socket isn't up yet, False if mpv won't take the filter
+    if process.get_property('af') is None:
+        return None
+    process.command('af', 'add', METER)
+    return any(f.get('label') == LABEL for f in process.get_property('af') or [])
+
+def meter_reading(process):
+    metadata = process.get_property(f"af-metadata/{LABEL}") or {}
+    try:
+        return float(metadata['lavfi.r128.I'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def gain_for(lufs, target=LOUDNESS_TARGET):
+    return round(max(-LOUDNESS_MAX_CUT, min(LOUDNESS_MAX_BOOST, target - lufs)), 2)
+
+class LoudnessIndex:
+    def __init__(self, path=LOUDNESS_INDEX):
+        self.path = path
+        self.tracks = read_json(path) or {}
+        self.lock = threading.Lock()
+
+    def gain(self, item):
+        entry = self.tracks.get(item['id'])
+        return None if entry is None else entry['gain']
+
+    def record(self, item, lufs):
+        with self.lock:
+            self.tracks[item['id']] = {'lufs': lufs, 'gain': gain_for(lufs)}
+            while len(self.tracks) > LOUDNESS_INDEX_SIZE:
+                del self.tracks[next(iter(self.tracks))]
+            data = json.dumps(self.tracks)
+        write_atomic(self.path, data)
@@ -0,0 +1,107 @@
+from config import METADATA_INDEX, METADATA_BATCH, METADATA_SAVE_INTERVAL, METADATA_CACHE_SIZE, METADATA_MISSING_TTL
+from session import write_atomic, read_json
+from scheduler import BACKGROUND
+import itertools
+import json
+import threading
+import time
+
+# lets a burst of queue additions collect into full batches
+COLLECT_DELAY = 0.2
+RETRY_DELAY = 30
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class MetadataCache:
+    def __init__(self, source, path=METADATA_INDEX):
+        self.source = source
+        self.path = path
+        self.entries = read_json(path) or {}
+        self.pending = {}
+        self.version = 0
+        self.saved_at = time.monotonic()
+        self.dirty = False
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def get(self, item):
+        if item.get('source') == 'local':
+            return {'duration': item.get('duration')}
+        return self.entries.get(item['id'])
+
+    def _known(self, video_id, now):
+        entry = self.entries.get(video_id)
+        if entry is None:
+            return False
+        # "YouTube had nothing" is only trusted for a while, older files stored it without a time
+        return not entry.get('missing') or now - entry.get('checked', 0) < METADATA_MISSING_TTL
+
+    def request(self, items):
+        now = time.time()
+        with self.cond:
+            for item in items:
+                if item.get('source', 'youtube') == 'youtube' and not self._known(item['id'], now):
+                    self.pending[item['id']] = None
+            if self.pending:
+                self.cond.notify()
+
+    def totals(self, items):
+        seconds = 0
+        unknown = 0
+        for item in items:
+            duration = (self.get(item) or {}).get('duration')
+            if duration:
+                seconds += duration
+            else:
+                unknown += 1
+        return seconds, unknown
+
+    def summary(self, items):
+        seconds, unknown = self.totals(items)
+        text = f"{len(items)} tracks, {format_duration(seconds)}"
+        return text + f" (+{unknown} unknown)" if unknown else text
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    if self.dirty:
+                        break
+                    self.cond.wait()
+            if self.pending:
+                time.sleep(COLLECT_DELAY)
+                self._fetch()
+            if self.dirty and (not self.pending or time.monotonic() - self.saved_at > METADATA_SAVE_INTERVAL):
+                self.save()
+
+    def _fetch(self):
+        with self.cond:
+            batch = list(itertools.islice(self.pending, METADATA_BATCH))
+            for video_id in batch:
+                del self.pending[video_id]
+        try:
+            found = self.source.run(self.source.metadata, batch, priority=BACKGROUND)
+        except Exception:
+            # dropped ids are asked for again the next time they are queued
+            time.sleep(RETRY_DELAY)
+            return
+        now = time.time()
+        with self.cond:
+            for video_id in batch:
+                # the request went through, so an absent id really has nothing; remember
+                # that for a while so it isn't fetched every time it is queued
+                self.entries[video_id] = found.get(video_id) or {'missing': True, 'checked': now}
+            while len(self.entries) > METADATA_CACHE_SIZE:
+                del self.entries[next(iter(self.entries))]
+            self.version += 1
+            self.dirty = True
+
+    def save(self):
+        with self.cond:
+            data = json.dumps(self.entries)
+            self.dirty = False
+            self.saved_at = time.monotonic()
+        write_atomic(self.path, data)
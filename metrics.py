@@ -0,0 +1,109 @@
+from collections import deque
+import json
+import os
+import threading
+import time
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+class Histogram:
+    def __init__(self, limit):
+        # keep a window of recent samples, percentiles are computed on demand
+        self.samples = deque(maxlen=limit)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, ts, value):
+        self.samples.append((ts, value))
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        values = sorted(v for _, v in self.samples)
+        if not values:
+            return {'count': 0}
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return {
+            'count': self.count,
+            'mean': self.total / self.count,
+            'p50': pick(0.50),
+            'p95': pick(0.95),
+            'p99': pick(0.99),
+            'max': values[-1],
+        }
+
+class Metrics:
+    def __init__(self, enabled=False, sample_limit=2048):
+        self.enabled = enabled
+        self.sample_limit = sample_limit
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, value_ms):
+        if not self.enabled:
+            return
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(self.sample_limit)
+            hist.add(time.time(), value_ms)
+
+    def _count(self, name, slot):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters.setdefault(name, [0, 0])[slot] += 1
+
+    def hit(self, name):
+        self._count(name, 0)
+
+    def miss(self, name):
+        self._count(name, 1)
+
+    def snapshot(self):
+        with self.lock:
+            timers = {name: h.summary() for name, h in self.histograms.items()}
+            caches = {name: {'hits': h, 'misses': m, 'ratio': h / (h + m) if h + m else 0.0}
+                      for name, (h, m) in self.counters.items()}
+        return {'timers': timers, 'caches': caches}
+
+    def export_jsonl(self, path):
+        with self.lock:
+            lines = [{'type': 'timer', 'name': name, 'ts': ts, 'ms': value}
+                     for name, h in self.histograms.items() for ts, value in h.samples]
+            lines += [{'type': 'cache', 'name': name, 'ts': time.time(), 'hits': h, 'misses': m}
+                      for name, (h, m) in self.counters.items()]
+        with open(path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+        return len(lines)
+
+metrics = Metrics(enabled=os.environ.get("TUNESHELL_METRICS") == "1")
@@ -0,0 +1,87 @@
+import itertools
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+
+# stderr lines that mean the stream URL stopped being valid mid-track
+EXPIRY_MARKERS = ("403 Forbidden", "HTTP error 403", "expired")
+
+_ids = itertools.count()
+
+class MpvProcess:
+    def __init__(self, url, start=0, gain=None):
+        self.url = url
+        self.ipc_path = os.path.join(tempfile.gettempdir(), f"tuneshell-{os.getpid()}-{next(_ids)}.sock")
+        args = ['mpv', '--no-video', f'--input-ipc-server={self.ipc_path}']
+        if start:
+            args.append(f'--start={start:.1f}')
+        if gain:
+            args.append(f'--af=lavfi=[volume={gain:+.2f}dB]')
+        args.append(url)
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                        text=True, errors='replace')
+        self.expired = False
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            if any(marker in line for marker in EXPIRY_MARKERS):
+                self.expired = True
+
+    def _close_socket(self):
+        if self._sock:
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def command(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(1.0)
+                    sock.connect(self.ipc_path)
+                    self._sock = sock
+                    self._reader = sock.makefile('r', encoding='utf-8')
+                request_id = next(self._request_ids)
+                self._sock.sendall((json.dumps({'command': list(args), 'request_id': request_id}) + "\n").encode())
+                for line in self._reader:
+                    reply = json.loads(line)
+                    if reply.get('request_id') == request_id:
+                        return reply.get('data') if reply.get('error') == 'success' else None
+                self._close_socket()
+            except (OSError, ValueError):
+                self._close_socket()
+        return None
+
+    def get_property(self, name):
+        return self.command('get_property', name)
+
+    def set_property(self, name, value):
+        return self.command('set_property', name, value)
+
+    def poll(self):
+        return self.process.poll()
+
+    def wait(self, timeout=None):
+        code = self.process.wait(timeout)
+        with self._lock:
+            self._close_socket()
+        try:
+            os.unlink(self.ipc_path)
+        except OSError:
+            pass
+        return code
+
+    def send_signal(self, sig):
+        self.process.send_signal(sig)
+
+    def terminate(self):
+        self.process.terminate()
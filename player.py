@@ -1,13 +1,38 @@
 from playlist import save_playlist, load_playlist
-from youtube import get_audio_url, search_youtube
+from youtube import iter_playlist_pages
+from resolver import Resolver, CircuitOpenError, UnavailableError
+from mpv import MpvProcess
+from library import Library
+from sources import default_registry, resolve_key
+from scheduler import PLAYBACK, PREFETCH, BACKGROUND
+from fuzzy import TitleIndex
+from shuffle import ShuffleOrder
+from session import SessionStore, MODES
+from quality import ThroughputMeter, profile_name, get_profile
+from loudness import LoudnessIndex, attach_meter, meter_reading
+from metadata import MetadataCache
+from headcache import HeadCache
+from availability import AvailabilityIndex
+from sequence import TrackQueue
+from undo import EditHistory
+from ytsync import sync_playlist, SyncError
+from config import IMPORT_PREFETCH, LOOKAHEAD, HISTORY_LIMIT, LOUDNESS_NORMALIZE, LOUDNESS_MIN_HEARD, HEAD_PREFETCH, FILL_KEEP_PLAYED
+from metrics import metrics
 from collections import deque
+import itertools
+import sequence
 import subprocess
 import threading
+import time
+
+# how often one track may be re-resolved after its stream URL expires
+MAX_RECOVERIES = 2
 
 class MusicPlayer:
     def __init__(self):
-        self.queue = deque()
-        self.history = []
+        self.queue = TrackQueue()
+        self.edits = EditHistory(self.queue.root)
+        self.history = deque(maxlen=HISTORY_LIMIT)
         self.current_index = None
         self.is_playing = False
         self.is_paused = False
@@ -20,43 +45,355 @@ class MusicPlayer:
         self.progress = 0
         self.duration = 0
         self.smart_fill_enabled = False
+        self.import_status = None
+        self.resolving = {}
+        self.resolver = Resolver()
+        self.status = None
+        self.retry_timer = None
+        self.failed_in_row = 0
+        self.recoveries = 0
+        self.throughput = ThroughputMeter()
+        self.library = Library()
+        self.sources = default_registry(self.resolver, self.library)
+        self.metadata = MetadataCache(self.sources['youtube'])
+        self.availability = AvailabilityIndex(self.sources)
+        self.queue_index = TitleIndex()
+        self.shuffle_order = ShuffleOrder()
+        self.queue_version = 0
+        self.current_stream = None
+        self.session = SessionStore()
+        self.loudness = LoudnessIndex()
+        self.heads = HeadCache()
+        # track changes come from the UI, the monitor thread and retry timers at once
+        self.transition = threading.RLock()
+        # every queue edit reads the current root and writes a new one, and the UI, importer,
+        # sync and monitor thread all edit; held across the edit, its bookkeeping and undo step
+        self.queue_lock = threading.RLock()
+
+    def _tracks_added(self, items, label="add", merge=False):
+        self.queue_version += 1
+        for item in items:
+            self.queue_index.add(item)
+            self.shuffle_order.add(item)
+        self.metadata.request(items)
+        self.edits.record(label, self.queue.root, added=items, merge=merge)
+
+    def _track_removed(self, item):
+        self.queue_version += 1
+        self.queue_index.remove(item)
+        self.shuffle_order.remove(item)
+        self.edits.record("remove", self.queue.root, removed=[item])
+
+    def _reindex(self):
+        items = list(self.queue)
+        self.shuffle_order.reset(items)
+        self.metadata.request(items)
+        self.availability.validate(items)
+        self.queue_index.rebuild(items)
+
+    def _queue_replaced(self, label="load", context=None):
+        self.queue_version += 1
+        self._reindex()
+        self.edits.record(label, self.queue.root, replaced=True, context=context)
 
     def add_to_queue(self, item):
-        self.queue.append(item)
-        if self.auto_save and self.playlist_name:
-            self.save_current_playlist()
+        # queue entries are told apart by identity, and search results, cached pages and
+        # the queue itself can hand the same dict over twice, so each add gets its own
+        item = dict(item)
+        with self.queue_lock:
+            self.queue.append(item)
+            self._tracks_added([item])
+            if self.auto_save and self.playlist_name:
+                self.save_current_playlist()
 
-    def add_multiple_to_queue(self, items):
-        self.queue.extend(items)
-        if self.auto_save and self.playlist_name:
+    def add_multiple_to_queue(self, items, label="add", merge=False):
+        items = [dict(item) for item in items]
+        with self.queue_lock:
+            self.queue.extend(items)
+            self._tracks_added(items, label, merge)
+            if self.auto_save and self.playlist_name:
+                self.save_current_playlist()
+
+    def import_playlist(self, url):
+        self.import_status = "Importing..."
+        threading.Thread(target=self._import_playlist, args=(url,), daemon=True).start()
+
+    def _import_playlist(self, url):
+        known = {item['id'] for item in list(self.queue)}
+        added = 0
+        try:
+            youtube = self.sources['youtube']
+            pages = iter_playlist_pages(url)
+            while True:
+                # playback waits on the first page, the rest can trickle in
+                page = youtube.run(next, pages, None, priority=BACKGROUND if added else PLAYBACK)
+                if page is None:
+                    break
+                new = []
+                for entry in page:
+                    if entry['id'] not in known:
+                        known.add(entry['id'])
+                        new.append(entry)
+                if not new:
+                    continue
+                with self.queue_lock:
+                    start = len(self.queue)
+                    self.queue.extend(new)
+                    # the whole import is one undo step
+                    self._tracks_added(new, "import", merge=added > 0)
+                added += len(new)
+                self.import_status = f"Importing... {added} tracks"
+                if added == len(new):
+                    self.warm(new[:IMPORT_PREFETCH])
+                    if not self.is_playing:
+                        threading.Thread(target=self.play, args=(start,), daemon=True).start()
+            self.import_status = f"Imported {added} tracks"
+        except Exception as e:
+            self.import_status = f"Import failed after {added} tracks: {e}"
+        if added and self.auto_save and self.playlist_name:
             self.save_current_playlist()
 
+    def sync_playlist(self, playlist_id):
+        self.import_status = "Syncing..."
+        threading.Thread(target=self._sync_playlist, args=(self.playlist_name, playlist_id), daemon=True).start()
+
+    def _sync_playlist(self, name, playlist_id):
+        # the sync works on the saved playlist; with auto save off the queue isn't
+        # written over it, so local edits since the last save stay local
+        try:
+            result = sync_playlist(name, playlist_id)
+        except SyncError as e:
+            self.import_status = f"Sync failed: {e}"
+            return
+        if result['added'] or result['removed']:
+            with self.queue_lock:
+                if name == self.playlist_name:
+                    self._apply_sync(result['added'], set(result['removed']))
+        saved = "" if self.auto_save else " (saved playlist)"
+        self.import_status = (f"Synced{saved}: {result['pulled']} added, {result['dropped']} removed here, "
+                              f"{result['pushed']} added, {result['deleted']} removed on YouTube")
+
+    def _apply_sync(self, pulled, dropped):
+        # only what changed on YouTube, so unsaved local edits survive; one undo step
+        # and one commit, under the lock the user's own edits take
+        known = {item['id'] for item in self.queue}
+        root, removed, index = self._without(i for i, item in enumerate(self.queue) if item['id'] in dropped)
+        new = [entry for entry in pulled if entry['id'] not in known]
+        for entry in new:
+            root = sequence.insert(root, sequence.size(root), entry)
+        if removed or new:
+            self._commit_queue("sync", root, removed, index, added=new)
+
+    def audio_profile(self):
+        return get_profile(profile_name(self.throughput))
+
+    def warm(self, items):
+        profile = self.audio_profile()
+        wanted = {item['url'] for item in items}
+        # finished prefetches that are no longer coming up only hold memory, the resolver cache has them too
+        for url, future in list(self.resolving.items()):
+            if future.done() and url not in wanted:
+                self.resolving.pop(url, None)
+        for item in items:
+            source = self.sources.for_item(item)
+            if source.remote and item['url'] not in self.resolving:
+                future = source.submit(source.resolve, item, profile=profile, priority=PREFETCH,
+                                       key=resolve_key(item, profile))
+                self.resolving[item['url']] = future
+                if HEAD_PREFETCH:
+                    future.add_done_callback(self._prefetch_head)
+
+    def _prefetch_head(self, future):
+        if future.exception() is None:
+            self.heads.prefetch(future.result())
+
     def save_current_playlist(self):
         save_playlist(self.playlist_name, list(self.queue))
 
     def remove_from_queue(self, index):
-        try:
-            removed = self.queue[index]
-            del self.queue[index]
-            if self.auto_save and self.playlist_name:
-                self.save_current_playlist()
-            return removed
-        except IndexError:
-            return None
+        with self.queue_lock:
+            try:
+                removed = self.queue[index]
+                del self.queue[index]
+                self._track_removed(removed)
+                if self.auto_save and self.playlist_name:
+                    self.save_current_playlist()
+                return removed
+            except IndexError:
+                return None
 
     def move_up(self, index):
-        if index > 0:
-            self.queue[index - 1], self.queue[index] = self.queue[index], self.queue[index - 1]
-            if self.auto_save and self.playlist_name:
-                self.save_current_playlist()
+        with self.queue_lock:
+            if index > 0:
+                self.queue[index - 1], self.queue[index] = self.queue[index], self.queue[index - 1]
+                self.queue_version += 1
+                self.edits.record("move", self.queue.root)
+                if self.auto_save and self.playlist_name:
+                    self.save_current_playlist()
 
     def move_down(self, index):
-        if index < len(self.queue) - 1:
-            self.queue[index + 1], self.queue[index] = self.queue[index], self.queue[index + 1]
+        with self.queue_lock:
+            if index < len(self.queue) - 1:
+                self.queue[index + 1], self.queue[index] = self.queue[index], self.queue[index + 1]
+                self.queue_version += 1
+                self.edits.record("move", self.queue.root)
+                if self.auto_save and self.playlist_name:
+                    self.save_current_playlist()
+
+    def _locate(self, item, hint):
+        # the caller's guess is checked in O(log n), only a wrong one costs a scan
+        if hint is not None and 0 <= hint < len(self.queue) and self.queue[hint] is item:
+            return hint
+        return self.index_of(item)
+
+    def _commit_queue(self, label, root, removed=(), index=None, merge=False, added=(), record=True):
+        # one transaction for bulk edits: a single version bump, index update, undo step and save.
+        # index is where the playing track ends up, or where to carry on from if it was removed.
+        # callers hold queue_lock from reading the old root until here
+        current = self.get_current_song()
+        self.queue.restore(root)
+        for item in removed:
+            self.queue_index.remove(item)
+            self.shuffle_order.remove(item)
+        for item in added:
+            self.queue_index.add(item)
+            self.shuffle_order.add(item)
+        if added:
+            self.metadata.request(added)
+        self.queue_version += 1
+        if record:
+            self.edits.record(label, root, added=added, removed=removed, merge=merge)
+        else:
+            self.edits.follow(root)
+        if current is not None:
+            if any(item is current for item in removed):
+                self.current_index = index
+            else:
+                self.current_index = self._locate(current, index)
+        if self.auto_save and self.playlist_name:
+            self.save_current_playlist()
+
+    def _without(self, indices):
+        # the queue minus those positions, the tracks taken out and where the playing index ends up
+        drop = sorted(set(indices), reverse=True)
+        root = self.queue.root
+        removed = []
+        for i in drop:
+            removed.append(sequence.get(root, i))
+            root = sequence.delete(root, i)
+        index = self.current_index
+        if index is not None:
+            kept_before = index - sum(1 for i in drop if i < index)
+            if index in drop:
+                index = kept_before - 1 if kept_before else None
+            else:
+                index = kept_before
+        return root, removed, index
+
+    def remove_many(self, indices, label="remove", merge=False):
+        with self.queue_lock:
+            root, removed, index = self._without(indices)
+            self._commit_queue(label, root, removed, index, merge)
+
+    def move_block(self, indices, position):
+        with self.queue_lock:
+            picked = sorted(set(indices))
+            root = self.queue.root
+            block = [sequence.get(root, i) for i in picked]
+            for i in reversed(picked):
+                root = sequence.delete(root, i)
+            position = max(0, min(position, sequence.size(root)))
+            for offset, item in enumerate(block):
+                root = sequence.insert(root, position + offset, item)
+            index = self.current_index
+            if index is not None:
+                if index in picked:
+                    index = position + picked.index(index)
+                else:
+                    index -= sum(1 for i in picked if i < index)
+                    if index >= position:
+                        index += len(block)
+            self._commit_queue("move", root, index=index)
+            return position
+
+    def play_next(self, indices):
+        with self.queue_lock:
+            current = self.get_current_song()
+            if current is None or id(current) in {id(self.queue[i]) for i in indices}:
+                return self.move_block(indices, 0)
+            before = sum(1 for i in indices if i < self.current_index)
+            return self.move_block(indices, self.current_index - before + 1)
+
+    def dedupe(self):
+        with self.queue_lock:
+            current = self.get_current_song()
+            keep = {}
+            for item in self.queue:
+                keep.setdefault(item['id'], item)
+            if current is not None:
+                keep[current['id']] = current
+            kept = set(map(id, keep.values()))
+            drop = [i for i, item in enumerate(self.queue) if id(item) not in kept]
+            if drop:
+                self.remove_many(drop, "dedupe")
+            return len(drop)
+
+    def sort_by_title(self, indices=None):
+        with self.queue_lock:
+            items = list(self.queue)
+            ordered = sorted((items[i] for i in indices) if indices else items, key=lambda item: item['title'].casefold())
+            if indices:
+                root = self.queue.root
+                for i, item in zip(sorted(indices), ordered):
+                    root = sequence.replace(root, i, item)
+            else:
+                # every position changes, nothing to share
+                root = sequence.build(ordered)
+            self._commit_queue("sort", root)
+
+    def undo(self):
+        # popping the step and restoring its root is one edit, or another thread could record in between
+        with self.queue_lock:
+            return self._switch(self.edits.undo(), undo=True)
+
+    def redo(self):
+        with self.queue_lock:
+            return self._switch(self.edits.redo(), undo=False)
+
+    def _switch(self, step, undo):
+        with self.queue_lock:
+            if step is None:
+                return None
+            current = self.get_current_song()
+            index = self.current_index
+            if undo:
+                root, gone, back = step.before, step.added, step.removed
+            else:
+                root, gone, back = step.after, step.removed, step.added
+            self.queue.restore(root)
+            if step.context:
+                self.playlist_name, self.auto_save = step.context[0 if undo else 1]
+            if step.replaced:
+                self._reindex()
+            else:
+                for item in gone:
+                    self.queue_index.remove(item)
+                    self.shuffle_order.remove(item)
+                for item in back:
+                    self.queue_index.add(item)
+                    self.shuffle_order.add(item)
+            self.queue_version += 1
+            if current is not None:
+                self.current_index = self._locate(current, index)
             if self.auto_save and self.playlist_name:
                 self.save_current_playlist()
+            return step
+
+    def play(self, index=None, start=0, fresh=False):
+        with self.transition:
+            self._play(index, start, fresh)
 
-    def play(self, index=None):
+    def _play(self, index, start, fresh):
         if len(self.queue) == 0:
             return
         if index is not None:
@@ -65,31 +402,146 @@ class MusicPlayer:
             self.current_index = 0
         self.stop()
         item = self.queue[self.current_index]
-        audio_url = get_audio_url(item['url'])
-        if not audio_url:
+        try:
+            audio_url = self._resolve(item, fresh)
+        except CircuitOpenError as e:
+            self.status = f"Network unavailable, retrying in {e.retry_after:.0f}s"
+            self.retry_timer = threading.Timer(e.retry_after, self.play, args=(self.current_index,))
+            self.retry_timer.daemon = True
+            self.retry_timer.start()
+            return
+        except Exception as e:
+            if isinstance(e, (UnavailableError, FileNotFoundError)):
+                self.availability.mark(item, False)
+            self.status = f"Skipped {item['title']}: {e}"
+            self.failed_in_row += 1
+            if self.failed_in_row < len(self.queue):
+                # hand off to a new thread so a run of dead tracks can't recurse
+                threading.Thread(target=self.next, daemon=True).start()
             return
+        self.failed_in_row = 0
+        self.status = None
+        self.availability.mark(item, True)
         self.is_playing = True
         self.is_paused = False
-        self.progress = 0
-        self.process = subprocess.Popen(['mpv', '--no-video', audio_url], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        threading.Thread(target=self._monitor_playback, daemon=True).start()
+        self.progress = start
+        if not start:
+            self.duration = 0
+            self.recoveries = 0
+            self._record_history(item)
+        self.current_stream = (item['url'], audio_url)
+        gain = None
+        if LOUDNESS_NORMALIZE:
+            gain = self.loudness.gain(item)
+        # without a stored gain the track is metered as it plays, see _track_position
+        metered = item if LOUDNESS_NORMALIZE and gain is None else None
+        with metrics.timer('spawn'):
+            # a cached head only helps from the top of the track
+            media_url = self.heads.media_url(audio_url) if HEAD_PREFETCH and not start else audio_url
+            self.process = MpvProcess(media_url, start=start, gain=gain)
+        threading.Thread(target=self._monitor_playback, args=(self.process, metered), daemon=True).start()
+        self.warm(self.upcoming(LOOKAHEAD))
 
-    def _monitor_playback(self):
-        if self.process:
-            self.process.wait()
+    def _record_history(self, item):
+        self.history.append(item)
+        try:
+            self.session.append_history(item)
+        except OSError:
+            pass
+
+    def restore_session(self):
+        self.history.extend(self.session.read_history())
+        state = self.session.load()
+        if not state:
+            return False
+        with self.queue_lock:
+            self.queue.replace(state['queue'])
+            self._queue_replaced()
+            # the restored queue is where undo stops
+            self.edits.reset(self.queue.root)
+        self.session.saved_queue_version = self.queue_version
+        for mode in MODES:
+            setattr(self, mode, bool(state.get(mode)))
+        self.playlist_name = state.get('playlist_name')
+        index = state.get('current_index')
+        if index is None or index >= len(self.queue):
+            return True
+        self.current_index = index
+        self.progress = state.get('progress') or 0
+        item = self.queue[index]
+        if self.shuffle:
+            self.shuffle_order.start(item)
+        stream = state.get('stream')
+        if stream and stream['url'] == item['url'] and stream['expires'] > time.time() + 60:
+            # seed the resolver so resuming skips extraction entirely
+            self.resolver.cache[(stream['url'], self.audio_profile()['name'])] = (stream['audio_url'], stream['expires'])
+        if state.get('playing'):
+            threading.Thread(target=self.play, args=(index,), kwargs={'start': self.progress}, daemon=True).start()
+        return True
+
+    def _resolve(self, item, fresh=False):
+        source = self.sources.for_item(item)
+        if not source.remote:
+            return source.resolve(item)
+        pending = None if fresh else self.resolving.pop(item['url'], None)
+        if pending and pending.done():
+            metrics.hit('stream_prefetch')
+            return pending.result()
+        metrics.miss('stream_prefetch')
+        # a prefetch still waiting in the scheduler gets promoted to playback priority
+        profile = self.audio_profile()
+        return source.run(source.resolve, item, fresh=fresh, profile=profile, priority=PLAYBACK,
+                          key=resolve_key(item, profile, fresh))
+
+    def _monitor_playback(self, process, metered=None):
+        if process:
+            threading.Thread(target=self._track_position, args=(process, metered), daemon=True).start()
+            process.wait()
+            if self.process is not process:
+                # stopped or replaced by another track, not a natural end
+                return
             self.is_playing = False
+            expired = process.expired or self.heads.is_expired(process.url)
+            if expired and self.recoveries < MAX_RECOVERIES:
+                # the stream URL expired mid-track, resume where it stopped
+                self.recoveries += 1
+                self.play(self.current_index, start=self.progress, fresh=True)
+                return
             self.progress = 0
             if self.repeat_one:
                 self.play(self.current_index)
-            elif self.repeat_queue:
-                self.next()
-            elif self.shuffle:
-                import random
-                self.current_index = random.randint(0, len(self.queue) - 1)
-                self.play(self.current_index)
             else:
                 self.next()
 
+    def _track_position(self, process, metered=None):
+        # metered is the item whose loudness this process measures, if any
+        attached = None
+        heard = 0
+        lufs = None
+        while process.poll() is None and self.process is process:
+            time.sleep(1)
+            if self.is_paused:
+                continue
+            if metered and attached is None:
+                attached = attach_meter(process)
+            elif attached:
+                heard += 1
+                reading = meter_reading(process)
+                if reading is not None:
+                    lufs = reading
+            position = process.get_property('time-pos')
+            if position is not None:
+                self.progress = position
+            if not self.duration:
+                self.duration = process.get_property('duration') or 0
+            # cache-speed is 0 once the readahead is full, only sample real transfers
+            speed = process.get_property('cache-speed')
+            if speed:
+                self.throughput.add(speed)
+        if lufs is not None and heard >= LOUDNESS_MIN_HEARD:
+            # applied from the next play on
+            self.loudness.record(metered, lufs)
+
     def pause(self):
         if self.process and self.is_playing:
             self.process.send_signal(subprocess.signal.SIGSTOP)
@@ -101,29 +553,90 @@ class MusicPlayer:
             self.is_paused = False
 
     def stop(self):
+        if self.retry_timer:
+            self.retry_timer.cancel()
+            self.retry_timer = None
         if self.process:
             self.process.terminate()
+            if self.is_paused:
+                # a stopped process only acts on SIGTERM once it runs again
+                self.process.send_signal(subprocess.signal.SIGCONT)
             self.process = None
         self.is_playing = False
         self.is_paused = False
 
+    def index_of(self, item):
+        for i, queued in enumerate(self.queue):
+            if queued is item:
+                return i
+        return None
+
+    def upcoming(self, count):
+        if not self.queue or self.repeat_one:
+            return []
+        live = lambda item: not self.availability.is_dead(item)
+        if self.shuffle:
+            return list(filter(live, self.shuffle_order.peek(count)))
+        start = 0 if self.current_index is None else self.current_index + 1
+        items = list(itertools.islice(filter(live, itertools.islice(self.queue, start, None)), count))
+        if self.repeat_queue and len(items) < count:
+            items += list(itertools.islice(filter(live, self.queue), count - len(items)))
+        return items
+
+    def toggle_shuffle(self):
+        self.shuffle = not self.shuffle
+        if self.shuffle:
+            self.shuffle_order.start(self.get_current_song())
+
     def next(self):
+        with self.transition:
+            self._next()
+
+    def _live_from(self, start):
+        for i, item in enumerate(itertools.islice(self.queue, start, None), start):
+            if not self.availability.is_dead(item):
+                return i
+        return len(self.queue)
+
+    def _next(self):
         if not self.queue:
             return
+        if self.shuffle:
+            item = self.shuffle_order.next()
+            for _ in range(len(self.queue)):
+                if item is None or not self.availability.is_dead(item):
+                    break
+                item = self.shuffle_order.next()
+            index = self.index_of(item) if item is not None else None
+            if index is not None:
+                self.play(index)
+                return
         if self.current_index is None:
-            self.current_index = 0
+            index = self._live_from(0)
         else:
-            self.current_index += 1
-            if self.current_index >= len(self.queue):
-                if self.smart_fill_enabled:
-                    self.smart_fill()
-                else:
-                    self.current_index = 0
+            index = self._live_from(self.current_index + 1)
+            if index >= len(self.queue):
+                self.current_index = len(self.queue)
+                if self.smart_fill_enabled and self.smart_fill():
+                    return
+                index = self._live_from(0)
+        # with nothing left that's known to play, try from the top anyway
+        self.current_index = index if index < len(self.queue) else 0
         self.play(self.current_index)
 
     def prev(self):
+        with self.transition:
+            self._prev()
+
+    def _prev(self):
         if not self.queue:
             return
+        if self.shuffle:
+            item = self.shuffle_order.prev()
+            index = self.index_of(item) if item is not None else None
+            if index is not None:
+                self.play(index)
+                return
         if self.current_index is None or self.current_index == 0:
             self.current_index = len(self.queue) - 1
         else:
@@ -131,15 +644,33 @@ class MusicPlayer:
         self.play(self.current_index)
 
     def smart_fill(self):
-        if self.current_index and self.current_index < len(self.queue):
-            last_id = self.queue[self.current_index - 1]['id']
-            recs = search_youtube(f"related:{last_id}", max_results=1)
+        if self.current_index and self.current_index <= len(self.queue):
+            try:
+                recs = self.sources.related(self.queue[self.current_index - 1], max_results=1)
+            except Exception as e:
+                self.status = f"Smart fill failed: {e}"
+                return False
             if recs:
                 rec = recs[0]
                 rec['title'] = f"✨ (fill) {rec['title']}"
-                self.queue.append(rec)
-                self.current_index = len(self.queue) - 1
+                rec['fill'] = True
+                with self.queue_lock:
+                    # trimmed first, so undoing this fill doesn't bring the trimmed ones back
+                    self._trim_fill()
+                    self.queue.append(rec)
+                    self._tracks_added([rec], "fill")
+                    self.current_index = len(self.queue) - 1
                 self.play(self.current_index)
+                return True
+        return False
+
+    def _trim_fill(self):
+        # an endless fill session would otherwise grow the queue by a track per song.
+        # housekeeping the user didn't do, so it is kept out of the undo history
+        played = [i for i in range(min(self.current_index, len(self.queue))) if self.queue[i].get('fill')]
+        if len(played) > FILL_KEEP_PLAYED:
+            root, removed, index = self._without(played[:len(played) - FILL_KEEP_PLAYED])
+            self._commit_queue("fill", root, removed, index, record=False)
 
     def toggle_auto_save(self):
         self.auto_save = not self.auto_save
@@ -150,9 +681,14 @@ class MusicPlayer:
         self.playlist_name = name
 
     def load_playlist(self, name):
-        self.queue = deque(load_playlist(name))
-        self.playlist_name = name
-        self.auto_save = True
+        with self.queue_lock:
+            before = (self.playlist_name, self.auto_save)
+            self.queue.replace(load_playlist(name))
+            self.playlist_name = name
+            self.auto_save = True
+            # undoing the load reopens the previous playlist too, so its autosave
+            # can't write the old queue into the file that was just loaded
+            self._queue_replaced(context=(before, (name, True)))
 
     def get_current_song(self):
         if self.current_index is not None and self.current_index < len(self.queue):
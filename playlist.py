@@ -1,5 +1,6 @@
 import os
 import json
+from metrics import metrics
 
 PLAYLISTS_DIR = "playlists"
 
@@ -10,7 +11,7 @@ def ensure_playlists_dir():
 def save_playlist(name, queue):
     ensure_playlists_dir()
     path = os.path.join(PLAYLISTS_DIR, name + ".json")
-    with open(path, "w", encoding="utf-8") as f:
+    with metrics.timer('save'), open(path, "w", encoding="utf-8") as f:
         json.dump(queue, f, indent=2)
 
 def load_playlist(name):
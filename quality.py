@@ -0,0 +1,71 @@
+from config import AUDIO_PROFILE, AUDIO_PROFILES, ADAPTIVE_TIERS, ADAPTIVE_DEFAULT
+import threading
+
+def _codec_filter(codec):
+    if codec == "m4a":
+        return "[ext=m4a]"
+    return f"[acodec={codec}]"
+
+def format_selector(profile):
+    # yt-dlp format string: preferred codecs under the ceiling first, then any
+    # audio under the ceiling, then the smallest audio stream
+    ceiling = f"[abr<=?{profile['max_abr']}]" if profile.get('max_abr') else ""
+    choices = [f"bestaudio{_codec_filter(c)}{ceiling}" for c in profile.get('codecs', [])]
+    choices.append(f"bestaudio{ceiling}")
+    if ceiling:
+        choices.append("worstaudio")
+    if not profile.get('audio_only', True):
+        choices.append(f"best{ceiling.replace('abr', 'tbr')}")
+    return "/".join(choices)
+
+def fallback_formats(profile):
+    formats = [format_selector(profile), "bestaudio"]
+    if not profile.get('audio_only', True):
+        formats.append("best")
+    return formats
+
+def _codec_rank(f, codecs):
+    acodec = f.get('acodec') or ''
+    for rank, codec in enumerate(codecs):
+        if acodec.startswith('mp4a' if codec == 'm4a' else codec) or f.get('ext') == codec:
+            return rank
+    return len(codecs)
+
+def pick_audio_format(formats, profile):
+    candidates = [f for f in formats if f.get('url') and f.get('acodec', 'none') != 'none']
+    if profile.get('audio_only', True):
+        audio_only = [f for f in candidates if f.get('vcodec', 'none') == 'none']
+        candidates = audio_only or candidates
+    if not candidates:
+        return None
+    ceiling = profile.get('max_abr')
+    bitrate = lambda f: f.get('abr') or f.get('tbr') or 0
+    under = [f for f in candidates if not ceiling or bitrate(f) <= ceiling]
+    if under:
+        codecs = profile.get('codecs', [])
+        return min(under, key=lambda f: (_codec_rank(f, codecs), -bitrate(f)))
+    return min(candidates, key=bitrate)
+
+class ThroughputMeter:
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.kbps = None
+        self.lock = threading.Lock()
+
+    def add(self, bytes_per_second):
+        kbps = bytes_per_second * 8 / 1000
+        with self.lock:
+            self.kbps = kbps if self.kbps is None else self.alpha * kbps + (1 - self.alpha) * self.kbps
+
+def profile_name(meter=None, setting=AUDIO_PROFILE):
+    if setting != "auto":
+        return setting
+    if meter is None or meter.kbps is None:
+        return ADAPTIVE_DEFAULT
+    for minimum, name in ADAPTIVE_TIERS:
+        if meter.kbps >= minimum:
+            return name
+    return ADAPTIVE_TIERS[-1][1]
+
+def get_profile(name):
+    return dict(AUDIO_PROFILES[name], name=name)
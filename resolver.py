@@ -0,0 +1,141 @@
+from youtube import get_audio_url
+from metrics import metrics
+from sharedcache import shared
+from quality import fallback_formats
+from config import SHARED_STREAM_HOSTS, RESOLVE_RETRIES, RESOLVE_BACKOFF, RESOLVE_FORMATS, CIRCUIT_FAILURES, CIRCUIT_COOLDOWN, RESOLVE_CACHE_SIZE
+from urllib.parse import urlparse, parse_qs
+import random
+import threading
+import time
+
+# googlevideo URLs carry their expiry, others get a conservative lifetime
+DEFAULT_TTL = 5 * 3600
+EXPIRY_MARGIN = 60
+
+# yt-dlp's messages for videos that will not play however often we retry; matched
+# whole, since looser words like "not available" also appear in format errors
+PERMANENT_ERRORS = ("Video unavailable", "This video is unavailable", "This video is not available",
+                    "Private video", "This video is private", "removed by the uploader",
+                    "account associated with this video has been terminated",
+                    "blocked it on copyright grounds", "Sign in to confirm your age")
+# the video is fine, only this format string matched nothing, so the next one may
+FORMAT_MISS = "Requested format is not available"
+
+class ResolveError(Exception):
+    pass
+
+class UnavailableError(ResolveError):
+    pass
+
+class ExtractError(Exception):
+    pass
+
+class CircuitOpenError(ResolveError):
+    def __init__(self, retry_after):
+        super().__init__(f"resolver paused for {retry_after:.0f}s after repeated failures")
+        self.retry_after = retry_after
+
+def trusted_stream(audio_url):
+    # what the shared cache hands back goes straight to mpv
+    if not isinstance(audio_url, str):
+        return False
+    parsed = urlparse(audio_url)
+    return parsed.scheme == 'https' and (parsed.hostname or '').endswith(SHARED_STREAM_HOSTS)
+
+def stream_expiry(audio_url):
+    expire = parse_qs(urlparse(audio_url).query).get('expire')
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+    return time.time() + DEFAULT_TTL
+
+class Resolver:
+    def __init__(self, retries=RESOLVE_RETRIES, backoff=RESOLVE_BACKOFF, formats=RESOLVE_FORMATS,
+                 failure_threshold=CIRCUIT_FAILURES, cooldown=CIRCUIT_COOLDOWN, cache_size=RESOLVE_CACHE_SIZE):
+        self.retries = retries
+        self.backoff = backoff
+        self.formats = formats
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.cache = {}
+        self.cache_size = cache_size
+        self.failures = 0
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def cached(self, url, profile=None):
+        entry = self.cache.get(self._key(url, profile))
+        if entry and entry[1] > time.time() + EXPIRY_MARGIN:
+            return entry[0]
+        return None
+
+    def _key(self, url, profile):
+        return (url, profile['name'] if profile else None)
+
+    def resolve(self, url, fresh=False, profile=None):
+        key = self._key(url, profile)
+        if not fresh:
+            audio_url = self.cached(url, profile)
+            if audio_url:
+                metrics.hit('resolve_cache')
+                return audio_url
+        metrics.miss('resolve_cache')
+        stale = self.cache.get(key)
+        now = time.time()
+        if self.open_until > now:
+            if stale and not fresh:
+                return stale[0]
+            raise CircuitOpenError(self.open_until - now)
+
+        try:
+            if shared:
+                # one process on the host extracts, the others wait for its answer
+                audio_url = shared.get_or_compute(f"stream:{key[0]}:{key[1]}", lambda: self._extract(url, profile),
+                                                  lambda audio_url: stream_expiry(audio_url) - EXPIRY_MARGIN, fresh=fresh,
+                                                  valid=trusted_stream)
+            else:
+                audio_url = self._extract(url, profile)
+        except ResolveError:
+            raise
+        except Exception as e:
+            with self.lock:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.open_until = time.time() + self.cooldown
+                    metrics.observe('circuit.open', self.cooldown * 1000)
+            if stale and not fresh:
+                # an expired URL sometimes still plays, and is better than nothing
+                return stale[0]
+            raise ResolveError(f"could not resolve {url}: {e}") from e
+        with self.lock:
+            self.failures = 0
+            # re-inserted so the dict stays ordered oldest first
+            self.cache.pop(key, None)
+            self.cache[key] = (audio_url, stream_expiry(audio_url))
+            if len(self.cache) > self.cache_size:
+                self._evict()
+        return audio_url
+
+    def _evict(self):
+        now = time.time()
+        for key in [key for key, (_, expires) in self.cache.items() if expires <= now]:
+            del self.cache[key]
+        while len(self.cache) > self.cache_size:
+            del self.cache[next(iter(self.cache))]
+
+    def _extract(self, url, profile):
+        formats = fallback_formats(profile) if profile else self.formats
+        last_error = None
+        for attempt in range(self.retries):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            for fmt in formats:
+                try:
+                    audio_url = get_audio_url(url, fmt, profile)
+                except Exception as e:
+                    if FORMAT_MISS not in str(e) and any(marker in str(e) for marker in PERMANENT_ERRORS):
+                        raise UnavailableError(str(e)) from e
+                    last_error = e
+                    continue
+                if audio_url:
+                    return audio_url
+        raise ExtractError(last_error or 'no audio formats')
@@ -0,0 +1,120 @@
+from metrics import metrics
+from concurrent.futures import Future
+import heapq
+import itertools
+import threading
+import time
+
+# priority classes, lower runs first
+INTERACTIVE = 0
+PLAYBACK = 1
+PREFETCH = 2
+FILL = 3
+BACKGROUND = 4
+CLASS_NAMES = ('interactive', 'playback', 'prefetch', 'fill', 'background')
+
+class RateLimiter:
+    # token bucket; rate is calls per second, None means unlimited
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Job:
+    def __init__(self, priority, key, fn, args, kwargs):
+        self.priority = priority
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.taken = False
+
+class Scheduler:
+    def __init__(self, name, workers, limiter):
+        self.name = name
+        self.limiter = limiter
+        self.heap = []
+        self.inflight = {}
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def submit(self, priority, key, fn, *args, **kwargs):
+        with self.cond:
+            job = self.inflight.get(key) if key is not None else None
+            if job is not None:
+                metrics.hit(f'dedupe.{self.name}')
+                if not job.taken and priority < job.priority:
+                    # someone more urgent wants the same thing, queue it again higher up
+                    job.priority = priority
+                    heapq.heappush(self.heap, (priority, next(self.counter), job))
+                    self.cond.notify()
+                return job.future
+            if key is not None:
+                metrics.miss(f'dedupe.{self.name}')
+            job = Job(priority, key, fn, args, kwargs)
+            if key is not None:
+                self.inflight[key] = job
+            heapq.heappush(self.heap, (priority, next(self.counter), job))
+            self.cond.notify()
+        return job.future
+
+    def run(self, priority, key, fn, *args, **kwargs):
+        return self.submit(priority, key, fn, *args, **kwargs).result()
+
+    def _next_job(self):
+        with self.cond:
+            while True:
+                while not self.heap:
+                    self.cond.wait()
+                if not self.limiter.rate:
+                    break
+                self.cond.release()
+                try:
+                    # take the token first so the job picked is the most urgent one at send time
+                    self.limiter.acquire()
+                finally:
+                    self.cond.acquire()
+                if self.heap:
+                    break
+            while self.heap:
+                job = heapq.heappop(self.heap)[2]
+                if not job.taken:
+                    job.taken = True
+                    return job
+        return None
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                continue
+            metrics.observe(f'queue_wait.{self.name}.{CLASS_NAMES[job.priority]}',
+                            (time.monotonic() - job.queued_at) * 1000)
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(*job.args, **job.kwargs))
+                except Exception as e:
+                    job.future.set_exception(e)
+            with self.cond:
+                if job.key is not None and self.inflight.get(job.key) is job:
+                    del self.inflight[job.key]
@@ -0,0 +1,196 @@
+from playlist import PLAYLISTS_DIR, list_playlists, load_playlist
+from metrics import metrics
+from scheduler import INTERACTIVE
+from config import SEARCH_PAGE_SIZE, SEARCH_PAGE_CACHE, SEARCH_CACHE_TTL
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+import time
+import os
+
+# reciprocal rank fusion constant, higher values flatten the rank bonus
+RRF_K = 10
+
+class LocalIndex:
+    def __init__(self, player):
+        self.player = player
+        self._playlists = {}
+
+    def _playlist_entries(self, name):
+        mtime = os.path.getmtime(os.path.join(PLAYLISTS_DIR, name + ".json"))
+        cached = self._playlists.get(name)
+        if cached and cached[0] == mtime:
+            metrics.hit('local_index')
+        else:
+            metrics.miss('local_index')
+            cached = (mtime, [(e['title'].lower(), e) for e in load_playlist(name) if e.get('id')])
+            self._playlists[name] = cached
+        return cached[1]
+
+    def _entries(self):
+        for e in reversed(list(self.player.history)):
+            yield e['title'].lower(), e
+        for e in list(self.player.queue):
+            yield e['title'].lower(), e
+        for name in list_playlists():
+            yield from self._playlist_entries(name)
+
+    def search(self, query, max_results=10, start=0):
+        words = query.lower().split()
+        seen = set()
+        results = []
+        for title, e in self._entries():
+            if e['id'] not in seen and all(w in title for w in words):
+                seen.add(e['id'])
+                results.append(e)
+                if len(results) >= start + max_results:
+                    break
+        return results[start:]
+
+class QueryPages:
+    # everything fetched so far for one query. Pages are only ever appended, so
+    # the rows above the page being merged never move while the user scrolls
+    def __init__(self, query):
+        self.query = query
+        self.created = time.monotonic()
+        self.results = []
+        self.pages = 0
+        self.pending = 0
+        self.exhausted = set()
+        self.errors = {}
+        # source name -> the lazy iterator a Walk source reads its later pages from
+        self.cursors = {}
+        self._head = 0
+        self._entries = {}
+        self._scores = {}
+
+class SearchPipeline:
+    def __init__(self, sources, weights=None, page_size=SEARCH_PAGE_SIZE, cache_size=SEARCH_PAGE_CACHE):
+        self.sources = sources
+        self.weights = weights or {}
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.pool = ThreadPoolExecutor(max_workers=2 * len(sources))
+        self.lock = threading.Lock()
+        # query -> QueryPages, least recently searched first
+        self.cache = OrderedDict()
+        self.current = None
+
+    def search(self, query):
+        with self.lock:
+            state = self.cache.pop(query, None)
+            if state is None or state.errors or time.monotonic() - state.created > SEARCH_CACHE_TTL:
+                metrics.miss('search_pages')
+                state = QueryPages(query)
+                self._fetch(state)
+            else:
+                metrics.hit('search_pages')
+            self.cache[query] = state
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self.current = state
+
+    def more(self):
+        # next page of the current query, if the last one is in and any source has more
+        with self.lock:
+            state = self.current
+            if state is None or state.pending or len(state.exhausted) == len(self.sources):
+                return False
+            self._fetch(state)
+            return True
+
+    def _fetch(self, state):
+        page = state.pages
+        state.pages += 1
+        state._head = len(state.results)
+        state._entries = {}
+        state._scores = {}
+        names = [name for name in self.sources if name not in state.exhausted]
+        state.pending = len(names)
+        for name in names:
+            self.pool.submit(self._run, state, name, self.sources[name], page * self.page_size)
+
+    def _run(self, state, name, fn, start):
+        try:
+            with metrics.timer(f'search.source.{name}'):
+                if isinstance(fn, Walk):
+                    entries = fn(state, name, self.page_size, start)
+                else:
+                    entries = fn(state.query, self.page_size, start)
+            error = None
+        except Exception as e:
+            entries = []
+            error = e
+        with self.lock:
+            state.pending -= 1
+            if error:
+                state.errors[name] = error
+            if error or len(entries) < self.page_size:
+                state.exhausted.add(name)
+            shown = state.results[:state._head]
+            seen = {e['id'] for e in shown}
+            weight = self.weights.get(name, 1.0)
+            for rank, e in enumerate(entries):
+                if e['id'] in seen:
+                    continue
+                state._entries.setdefault(e['id'], e)
+                state._scores[e['id']] = state._scores.get(e['id'], 0) + weight / (RRF_K + rank)
+            # publish a fresh list so readers never see a half-sorted one
+            state.results = shown + sorted(state._entries.values(), key=lambda e: -state._scores[e['id']])
+
+    @property
+    def query(self):
+        return self.current.query if self.current else None
+
+    @property
+    def results(self):
+        return self.current.results if self.current else []
+
+    @property
+    def errors(self):
+        return self.current.errors if self.current else {}
+
+    @property
+    def searching(self):
+        return bool(self.current and self.current.pending)
+
+    @property
+    def loading_more(self):
+        return self.searching and self.current.pages > 1
+
+def on_source(source, fn):
+    # the work runs in the source's own pool, so a slow source can't starve the rest
+    return lambda query, max_results, start=0: source.run(fn, query, max_results, start, priority=INTERACTIVE,
+                                                          key=(fn.__name__, query, max_results, start))
+
+class Walk:
+    # a source that can only be read from the top, like a YouTube search: the first
+    # page is the plain paged call (so the shared cache can answer it), later pages
+    # take the next entries off one lazy iterator kept with the query
+    def __init__(self, source, first, walk):
+        self.source = source
+        self.first = on_source(source, first)
+        self.walk = walk
+
+    def __call__(self, state, name, max_results, start):
+        if not start:
+            return self.first(state.query, max_results)
+        cursor = state.cursors.get(name)
+        if cursor is None:
+            # the walk starts at the top, skip what the first page already showed
+            cursor = state.cursors[name] = itertools.islice(self.walk(state.query), start, None)
+        # one page at a time per query, so the iterator is never read from two threads
+        return self.source.run(lambda: list(itertools.islice(cursor, max_results)), priority=INTERACTIVE)
+
+def default_pipeline(player):
+    youtube = player.sources['youtube']
+    local = player.sources['local']
+    downloads = player.sources['downloads']
+    return SearchPipeline({
+        'youtube': Walk(youtube, youtube.search, youtube.walk),
+        'music': Walk(youtube, youtube.search_music, youtube.walk_music),
+        'local': LocalIndex(player).search,
+        'library': on_source(local, local.search),
+        'downloads': on_source(downloads, downloads.search),
+    }, weights={'local': 1.2, 'library': 1.2, 'downloads': 1.2})
@@ -0,0 +1,171 @@
+# Persistent sequence: a weight-balanced tree ordered by position. Nodes are never
+# changed after they are built, an edit copies only the O(log n) nodes on its path
+# and shares the rest, so every earlier root stays a valid, cheap snapshot.
+
+# balance parameters from Adams' trees as fixed by Hirai and Yamamoto (3, 2)
+DELTA = 3
+RATIO = 2
+
+class Node:
+    __slots__ = ('left', 'item', 'right', 'size')
+
+    def __init__(self, left, item, right):
+        self.left = left
+        self.item = item
+        self.right = right
+        self.size = (left.size if left else 0) + (right.size if right else 0) + 1
+
+def size(t):
+    return t.size if t else 0
+
+def _balance(left, item, right):
+    sl, sr = size(left), size(right)
+    if sl + sr <= 1:
+        return Node(left, item, right)
+    if sr > DELTA * sl:
+        rl, rr = right.left, right.right
+        if size(rl) < RATIO * size(rr):
+            return Node(Node(left, item, rl), right.item, rr)
+        return Node(Node(left, item, rl.left), rl.item, Node(rl.right, right.item, rr))
+    if sl > DELTA * sr:
+        ll, lr = left.left, left.right
+        if size(lr) < RATIO * size(ll):
+            return Node(ll, left.item, Node(lr, item, right))
+        return Node(Node(ll, left.item, lr.left), lr.item, Node(lr.right, item, right))
+    return Node(left, item, right)
+
+def build(items, lo=0, hi=None):
+    if hi is None:
+        hi = len(items)
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return Node(build(items, lo, mid), items[mid], build(items, mid + 1, hi))
+
+def get(t, i):
+    while True:
+        sl = size(t.left)
+        if i < sl:
+            t = t.left
+        elif i > sl:
+            i -= sl + 1
+            t = t.right
+        else:
+            return t.item
+
+def replace(t, i, item):
+    sl = size(t.left)
+    if i < sl:
+        return Node(replace(t.left, i, item), t.item, t.right)
+    if i > sl:
+        return Node(t.left, t.item, replace(t.right, i - sl - 1, item))
+    return Node(t.left, item, t.right)
+
+def insert(t, i, item):
+    if t is None:
+        return Node(None, item, None)
+    sl = size(t.left)
+    if i <= sl:
+        return _balance(insert(t.left, i, item), t.item, t.right)
+    return _balance(t.left, t.item, insert(t.right, i - sl - 1, item))
+
+def _pop_min(t):
+    if t.left is None:
+        return t.item, t.right
+    item, left = _pop_min(t.left)
+    return item, _balance(left, t.item, t.right)
+
+def _pop_max(t):
+    if t.right is None:
+        return t.item, t.left
+    item, right = _pop_max(t.right)
+    return item, _balance(t.left, t.item, right)
+
+def _glue(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.size > right.size:
+        item, left = _pop_max(left)
+    else:
+        item, right = _pop_min(right)
+    return _balance(left, item, right)
+
+def delete(t, i):
+    sl = size(t.left)
+    if i < sl:
+        return _balance(delete(t.left, i), t.item, t.right)
+    if i > sl:
+        return _balance(t.left, t.item, delete(t.right, i - sl - 1))
+    return _glue(t.left, t.right)
+
+def iterate(t):
+    stack = []
+    while stack or t:
+        while t:
+            stack.append(t)
+            t = t.left
+        t = stack.pop()
+        yield t.item
+        t = t.right
+
+class TrackQueue:
+    # the queue as a mutable view over a persistent sequence, with the slice of the
+    # deque/list interface the player and UI use; root is a snapshot of the contents
+    def __init__(self, items=()):
+        self.root = build(list(items))
+        self._cache = (self.root, None)
+
+    def __len__(self):
+        return size(self.root)
+
+    def _index(self, i):
+        n = size(self.root)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("queue index out of range")
+        return i
+
+    def __getitem__(self, i):
+        return get(self.root, self._index(i))
+
+    def __setitem__(self, i, item):
+        self.root = replace(self.root, self._index(i), item)
+
+    def __delitem__(self, i):
+        self.root = delete(self.root, self._index(i))
+
+    def items(self):
+        # materialized once per version, readers iterate this list and never change it
+        root, items = self._cache
+        if root is not self.root or items is None:
+            root = self.root
+            items = list(iterate(root))
+            self._cache = (root, items)
+        return items
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def append(self, item):
+        self.root = insert(self.root, size(self.root), item)
+
+    def extend(self, items):
+        root = self.root
+        for item in items:
+            root = insert(root, size(root), item)
+        self.root = root
+
+    def insert(self, i, item):
+        self.root = insert(self.root, max(0, min(i, size(self.root))), item)
+
+    def clear(self):
+        self.root = None
+
+    def replace(self, items):
+        self.root = build(list(items))
+
+    def restore(self, root):
+        self.root = root
@@ -0,0 +1,106 @@
+from config import SESSION_FILE, SESSION_QUEUE_FILE, SESSION_INTERVAL, HISTORY_FILE, HISTORY_LIMIT
+from metrics import metrics
+from resolver import stream_expiry
+from collections import deque
+import json
+import os
+import threading
+import time
+
+MODES = ('repeat_one', 'repeat_queue', 'shuffle', 'smart_fill_enabled', 'auto_save')
+
+def write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class SessionStore:
+    def __init__(self, path=SESSION_FILE, queue_path=SESSION_QUEUE_FILE, history_path=HISTORY_FILE,
+                 history_limit=HISTORY_LIMIT, interval=SESSION_INTERVAL):
+        self.path = path
+        self.queue_path = queue_path
+        self.history_path = history_path
+        self.history_limit = history_limit
+        self.interval = interval
+        self.saved_queue_version = None
+        self.history_lines = None
+        self.lock = threading.Lock()
+
+    def start(self, player):
+        threading.Thread(target=self._autosave, args=(player,), daemon=True).start()
+
+    def _autosave(self, player):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.save(player)
+            except OSError:
+                pass
+
+    def save(self, player):
+        with self.lock, metrics.timer('session.save'):
+            # the queue can be huge, only rewrite it when it actually changed
+            if player.queue_version != self.saved_queue_version:
+                version = player.queue_version
+                write_atomic(self.queue_path, json.dumps(list(player.queue)))
+                self.saved_queue_version = version
+            state = {mode: getattr(player, mode) for mode in MODES}
+            state.update({
+                'current_index': player.current_index,
+                'progress': player.progress,
+                'playing': player.is_playing and not player.is_paused,
+                'playlist_name': player.playlist_name,
+                'saved_at': time.time(),
+            })
+            song = player.get_current_song()
+            if song and player.current_stream and player.current_stream[0] == song['url'] \
+                    and song.get('source') != 'local':
+                audio_url = player.current_stream[1]
+                state['stream'] = {'url': song['url'], 'audio_url': audio_url,
+                                   'expires': stream_expiry(audio_url)}
+            write_atomic(self.path, json.dumps(state))
+
+    def load(self):
+        state = read_json(self.path)
+        queue = read_json(self.queue_path)
+        if not isinstance(state, dict) or not isinstance(queue, list):
+            return None
+        state['queue'] = queue
+        return state
+
+    def append_history(self, item):
+        line = json.dumps({'ts': time.time(), 'title': item['title'], 'id': item['id'], 'url': item['url'],
+                           **({'source': item['source'], 'path': item['path']} if item.get('source') == 'local' else {})})
+        with self.lock:
+            if self.history_lines is None:
+                self.history_lines = 0
+                if os.path.exists(self.history_path):
+                    with open(self.history_path, "r", encoding="utf-8") as f:
+                        self.history_lines = sum(1 for _ in f)
+            with open(self.history_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.history_lines += 1
+            # append-only, compacted back to the limit once it doubles
+            if self.history_lines > 2 * self.history_limit:
+                kept = self.read_history()
+                write_atomic(self.history_path, "".join(json.dumps(e) + "\n" for e in kept))
+                self.history_lines = len(kept)
+
+    def read_history(self):
+        entries = deque(maxlen=self.history_limit)
+        if os.path.exists(self.history_path):
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return list(entries)
@@ -0,0 +1,147 @@
+from config import SHARED_CACHE_PATH, SHARED_CACHE_LEASE, SHARED_CACHE_MMAP
+from metrics import metrics
+import json
+import os
+import socket
+import sqlite3
+import stat
+import sys
+import threading
+import time
+
+# every this many writes, expired rows are swept out
+SWEEP_EVERY = 200
+POLL_INTERVAL = 0.1
+
+class SharedCacheError(Exception):
+    pass
+
+def _check_private(path):
+    # whoever can write the file decides what we resolve and play, so it must be ours alone
+    st = os.lstat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise SharedCacheError(f"{path} is not a regular file")
+    if st.st_uid != os.getuid():
+        raise SharedCacheError(f"{path} belongs to another user")
+    if st.st_mode & 0o077:
+        raise SharedCacheError(f"{path} is open to other users (mode {stat.S_IMODE(st.st_mode):o})")
+
+class SharedCache:
+    # sqlite in WAL mode: readers never block each other or the single writer,
+    # and the mmap lets every process on the host read pages straight from the
+    # page cache. Leases give single-flight across processes.
+    def __init__(self, path, lease=SHARED_CACHE_LEASE):
+        self.path = path
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.local = threading.local()
+        self.writes = 0
+        try:
+            # O_EXCL and O_NOFOLLOW so a file or link planted at the path is never adopted
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR | os.O_NOFOLLOW, 0o600))
+        except FileExistsError:
+            pass
+        # sqlite gives the -wal and -shm files the database's mode, but only if it creates them
+        for name in (path, path + "-wal", path + "-shm"):
+            if name == path or os.path.lexists(name):
+                _check_private(name)
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(f"PRAGMA mmap_size={SHARED_CACHE_MMAP}")
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, until REAL)")
+            self.local.db = db
+        return db
+
+    def get(self, key):
+        row = self._db().execute("SELECT value FROM entries WHERE key = ? AND expires > ?",
+                                 (key, time.time())).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key, value, expires):
+        db = self._db()
+        db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, json.dumps(value), expires))
+        self.writes += 1
+        if self.writes % SWEEP_EVERY == 0:
+            now = time.time()
+            db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+            db.execute("DELETE FROM leases WHERE until <= ?", (now,))
+
+    def _acquire(self, key):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT until FROM leases WHERE key = ?", (key,)).fetchone()
+            # a lease outlives a crashed holder by at most self.lease seconds
+            if row is not None and row[0] > now:
+                return False
+            db.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (key, self.owner, now + self.lease))
+            return True
+        finally:
+            db.execute("COMMIT")
+
+    def _renew(self, key, done):
+        # a resolve can outlast one lease (retries times formats plus backoff), so the
+        # holder keeps extending it; a crashed holder still loses it within self.lease
+        while not done.wait(self.lease / 3):
+            try:
+                self._db().execute("UPDATE leases SET until = ? WHERE key = ? AND owner = ?",
+                                   (time.time() + self.lease, key, self.owner))
+            except sqlite3.Error:
+                pass
+
+    def _release(self, key):
+        self._db().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def get_or_compute(self, key, compute, expires, fresh=False, valid=None):
+        # expires maps the computed value to its absolute expiry time; a stored value
+        # that fails valid is treated as missing and replaced
+        try:
+            while True:
+                value = None if fresh else self.get(key)
+                if value is not None and (valid is None or valid(value)):
+                    metrics.hit('shared_cache')
+                    return value
+                if self._acquire(key):
+                    break
+                time.sleep(POLL_INTERVAL)
+                fresh = False
+        except sqlite3.Error:
+            return compute()
+        metrics.miss('shared_cache')
+        done = threading.Event()
+        threading.Thread(target=self._renew, args=(key, done), daemon=True).start()
+        try:
+            value = compute()
+            if valid is None or valid(value):
+                try:
+                    self.put(key, value, expires(value))
+                except sqlite3.Error:
+                    pass
+            return value
+        finally:
+            done.set()
+            try:
+                self._release(key)
+            except sqlite3.Error:
+                pass
+
+    def cached(self, key, compute, ttl, valid=None):
+        return self.get_or_compute(key, compute, lambda value: time.time() + ttl, valid=valid)
+
+def _open(path):
+    try:
+        return SharedCache(os.path.expanduser(path))
+    except (SharedCacheError, OSError) as e:
+        # every cache still works per process, only the sharing is lost
+        print(f"tuneshell: not using shared cache: {e}", file=sys.stderr)
+        return None
+
+_path = os.environ.get("TUNESHELL_SHARED_CACHE", SHARED_CACHE_PATH)
+shared = _open(_path) if _path else None
@@ -0,0 +1,114 @@
+from config import SHUFFLE_WEIGHTED
+from collections import deque
+import random
+
+class ShuffleOrder:
+    # Lazily drawn Fisher-Yates permutation over the queue. Items are tracked
+    # by identity; each cycle plays every track once before any repeats.
+    def __init__(self, items=(), weighted=SHUFFLE_WEIGHTED, history_limit=500):
+        self.weighted = weighted
+        self.play_counts = {}
+        self.history = deque(maxlen=history_limit)
+        self.reset(items)
+
+    def reset(self, items=()):
+        self.members = {id(item): item for item in items}
+        self.pool = list(self.members.values())
+        self.slots = {id(item): i for i, item in enumerate(self.pool)}
+        self.upcoming = deque()
+        self.deferred = []
+        self.cycle_draws = 0
+        self.history.clear()
+
+    def start(self, current=None):
+        self.reset(list(self.members.values()))
+        if current is not None and id(current) in self.members:
+            self._take(self.slots[id(current)])
+            self.history.append(current)
+
+    def add(self, item):
+        key = id(item)
+        if key not in self.members:
+            self.members[key] = item
+            self.slots[key] = len(self.pool)
+            self.pool.append(item)
+
+    def remove(self, item):
+        key = id(item)
+        if self.members.pop(key, None) is None:
+            return
+        if key in self.slots:
+            self._take(self.slots[key])
+        elif any(i is item for i in self.deferred):
+            self.deferred = [i for i in self.deferred if i is not item]
+        else:
+            self.upcoming = deque(i for i in self.upcoming if i is not item)
+
+    def _take(self, slot):
+        # swap with the last element so removal from the pool is O(1)
+        pool = self.pool
+        item = pool[slot]
+        last = pool.pop()
+        if last is not item:
+            pool[slot] = last
+            self.slots[id(last)] = slot
+        del self.slots[id(item)]
+        return item
+
+    def _draw(self):
+        if self.deferred and (self.cycle_draws >= len(self.deferred) or not self.pool):
+            for item in self.deferred:
+                self.slots[id(item)] = len(self.pool)
+                self.pool.append(item)
+            self.deferred = []
+        if not self.pool:
+            self._refill()
+            if not self.pool:
+                return None
+        self.cycle_draws += 1
+        if self.weighted:
+            weights = [1 / (1 + self.play_counts.get(i['id'], 0)) for i in self.pool]
+            slot = random.choices(range(len(self.pool)), weights)[0]
+        else:
+            slot = random.randrange(len(self.pool))
+        return self._take(slot)
+
+    def _refill(self):
+        # start a new cycle; the most recently played tracks sit out its first
+        # draws so a cycle boundary never repeats a song straight away
+        queued = {id(i) for i in self.upcoming}
+        count = len(self.members) // 2
+        recent = {id(i) for i in list(self.history)[-count:]} if count else set()
+        self.pool = [i for k, i in self.members.items() if k not in queued and k not in recent]
+        self.deferred = [i for k, i in self.members.items() if k in recent and k not in queued]
+        self.slots = {id(i): n for n, i in enumerate(self.pool)}
+        self.cycle_draws = 0
+
+    def peek(self, n=1):
+        while len(self.upcoming) < n:
+            item = self._draw()
+            if item is None:
+                break
+            self.upcoming.append(item)
+        return list(self.upcoming)[:n]
+
+    def next(self):
+        if not self.peek(1):
+            return None
+        item = self.upcoming.popleft()
+        self.history.append(item)
+        self.play_counts[item['id']] = self.play_counts.get(item['id'], 0) + 1
+        if len(self.play_counts) > 2 * len(self.members) + 1000:
+            # forget tracks that have left the queue
+            queued = {i['id'] for i in self.members.values()}
+            self.play_counts = {k: n for k, n in self.play_counts.items() if k in queued}
+        return item
+
+    def prev(self):
+        while len(self.history) >= 2:
+            current = self.history.pop()
+            if id(current) in self.members:
+                self.upcoming.appendleft(current)
+            if id(self.history[-1]) in self.members:
+                return self.history[-1]
+        return None
@@ -0,0 +1,235 @@
+from youtube import search_youtube, search_youtube_music, iter_search_youtube, iter_search_youtube_music, fetch_metadata
+from config import SOURCE_LIMITS, DOWNLOAD_DIR, AUDIO_EXTENSIONS, SEARCH_CACHE_TTL, METADATA_CACHE_TTL
+from sharedcache import shared
+from scheduler import Scheduler, RateLimiter, FILL, BACKGROUND
+import json
+import os
+import re
+import threading
+import time
+
+VIDEO_ID = re.compile(r"[A-Za-z0-9_-]{11}")
+
+def trusted_results(entries):
+    # shared search rows are resolved and played, so only plain YouTube watch URLs
+    return isinstance(entries, list) and all(
+        isinstance(e, dict) and isinstance(e.get('id'), str) and VIDEO_ID.fullmatch(e['id'])
+        and e.get('url') == f"https://www.youtube.com/watch?v={e['id']}" for e in entries)
+
+class Source:
+    name = None
+    # remote sources are worth resolving ahead of time
+    remote = False
+
+    def __init__(self):
+        workers, rate, burst = SOURCE_LIMITS[self.name]
+        # every request to this source goes through here, see scheduler.py for the classes
+        self.scheduler = Scheduler(self.name, workers, RateLimiter(rate, burst))
+
+    def submit(self, fn, *args, priority=BACKGROUND, key=None, **kwargs):
+        return self.scheduler.submit(priority, key, fn, *args, **kwargs)
+
+    def run(self, fn, *args, priority=BACKGROUND, key=None, **kwargs):
+        return self.submit(fn, *args, priority=priority, key=key, **kwargs).result()
+
+    def owns(self, item):
+        return False
+
+    def search(self, query, max_results=10, start=0):
+        return []
+
+    def resolve(self, item, fresh=False, profile=None):
+        raise NotImplementedError
+
+    def related(self, item, max_results=1):
+        return []
+
+    def metadata(self, ids):
+        return {}
+
+    def available(self, items):
+        return {item['id'] for item in items}
+
+class YouTubeSource(Source):
+    name = 'youtube'
+    remote = True
+
+    def __init__(self, resolver):
+        super().__init__()
+        self.resolver = resolver
+
+    def owns(self, item):
+        return item.get('source', 'youtube') == 'youtube'
+
+    def search(self, query, max_results=10, start=0):
+        if shared:
+            return shared.cached(f"search:{start}:{max_results}:{query}",
+                                 lambda: search_youtube(query, max_results, start), SEARCH_CACHE_TTL,
+                                 valid=trusted_results)
+        return search_youtube(query, max_results, start)
+
+    def search_music(self, query, max_results=10, start=0):
+        if shared:
+            return shared.cached(f"music:{start}:{max_results}:{query}",
+                                 lambda: search_youtube_music(query, max_results, start), SEARCH_CACHE_TTL,
+                                 valid=trusted_results)
+        return search_youtube_music(query, max_results, start)
+
+    def walk(self, query):
+        # the rest of a search past its first page, read lazily; see search.Walk
+        return iter_search_youtube(query)
+
+    def walk_music(self, query):
+        return iter_search_youtube_music(query)
+
+    def resolve(self, item, fresh=False, profile=None):
+        return self.resolver.resolve(item['url'], fresh=fresh, profile=profile)
+
+    def related(self, item, max_results=1):
+        return search_youtube(f"related:{item['id']}", max_results=max_results)
+
+    def metadata(self, ids):
+        if not shared:
+            return fetch_metadata(ids)
+        # batches differ between processes, so share per id and skip single-flight
+        found = {}
+        for video_id in ids:
+            meta = shared.get(f"meta:{video_id}")
+            if meta is not None:
+                found[video_id] = meta
+        missing = [video_id for video_id in ids if video_id not in found]
+        if missing:
+            fetched = fetch_metadata(missing)
+            expires = time.time() + METADATA_CACHE_TTL
+            for video_id, meta in fetched.items():
+                shared.put(f"meta:{video_id}", meta, expires)
+            found.update(fetched)
+        return found
+
+    def available(self, items):
+        # unavailable videos are simply left out of a watch_videos list; never
+        # from the shared cache, which can be days old. A failed request raises
+        # rather than leaving every id out, so nothing is marked dead for it
+        return set(fetch_metadata([item['id'] for item in items]))
+
+class LocalSource(Source):
+    name = 'local'
+
+    def __init__(self, library):
+        super().__init__()
+        self.library = library
+
+    def owns(self, item):
+        return item.get('source') == 'local'
+
+    def search(self, query, max_results=10, start=0):
+        return self.library.search(query, max_results, start)
+
+    def resolve(self, item, fresh=False, profile=None):
+        # local files go straight to mpv, no extraction needed
+        if not os.path.exists(item['path']):
+            raise FileNotFoundError(item['path'])
+        return item['path']
+
+    def available(self, items):
+        return {item['id'] for item in items if os.path.exists(item['path'])}
+
+class DownloadCacheSource(Source):
+    # audio saved by `yt-dlp -x --write-info-json -o "<DOWNLOAD_DIR>/%(id)s.%(ext)s"`,
+    # served in place of the stream for the same video id
+    name = 'downloads'
+
+    def __init__(self, directory=DOWNLOAD_DIR):
+        super().__init__()
+        self.directory = directory
+        self.files = {}
+        self.titles = {}
+        self.scanned = 0
+        self.lock = threading.Lock()
+
+    def _scan(self):
+        try:
+            mtime = os.path.getmtime(self.directory)
+        except OSError:
+            return
+        if mtime == self.scanned:
+            return
+        files, titles = {}, {}
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in AUDIO_EXTENSIONS:
+                files[stem] = os.path.join(self.directory, name)
+        for video_id in files:
+            try:
+                with open(os.path.join(self.directory, video_id + ".info.json"), "r", encoding="utf-8") as f:
+                    titles[video_id] = json.load(f).get('title') or video_id
+            except (OSError, ValueError):
+                titles[video_id] = video_id
+        with self.lock:
+            self.files, self.titles, self.scanned = files, titles, mtime
+
+    def owns(self, item):
+        self._scan()
+        return item.get('source', 'youtube') == 'youtube' and item['id'] in self.files
+
+    def search(self, query, max_results=10, start=0):
+        self._scan()
+        words = query.lower().split()
+        with self.lock:
+            titles = list(self.titles.items())
+        results = []
+        for video_id, title in titles:
+            if all(w in title.lower() for w in words):
+                results.append({'title': title, 'id': video_id,
+                                'url': f"https://www.youtube.com/watch?v={video_id}"})
+                if len(results) >= start + max_results:
+                    break
+        return results[start:]
+
+    def resolve(self, item, fresh=False, profile=None):
+        path = self.files.get(item['id'])
+        if not path or not os.path.exists(path):
+            raise FileNotFoundError(path or item['id'])
+        return path
+
+class SourceRegistry:
+    def __init__(self):
+        self.sources = {}
+
+    def register(self, source):
+        self.sources[source.name] = source
+        return source
+
+    def __getitem__(self, name):
+        return self.sources[name]
+
+    def __iter__(self):
+        return iter(self.sources.values())
+
+    def for_item(self, item):
+        # registration order decides who serves an item several sources could play
+        for source in self.sources.values():
+            if source.owns(item):
+                return source
+        raise LookupError(f"no source can play {item.get('url')}")
+
+    def related(self, item, max_results=1):
+        # a downloaded video has no recommendations of its own, YouTube still does
+        for source in self.sources.values():
+            if source.owns(item):
+                found = source.run(source.related, item, max_results=max_results, priority=FILL,
+                                   key=('related', item['id'], max_results))
+                if found:
+                    return found
+        return []
+
+def resolve_key(item, profile, fresh=False):
+    # prefetch and playback asking for the same stream share one extraction
+    return ('resolve', item['url'], profile['name'] if profile else None, fresh)
+
+def default_registry(resolver, library):
+    registry = SourceRegistry()
+    registry.register(DownloadCacheSource())
+    registry.register(LocalSource(library))
+    registry.register(YouTubeSource(resolver))
+    return registry
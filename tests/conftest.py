@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the stand-ins in development/fakes answer for yt-dlp, mpv and the YouTube API
+sys.path[:0] = [os.path.join(ROOT, "development", "fakes"), ROOT]
+os.environ["PATH"] = os.path.join(ROOT, "development", "fakes") + os.pathsep + os.environ["PATH"]
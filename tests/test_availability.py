@@ -0,0 +1,39 @@
+from availability import AvailabilityIndex
+from resolver import Resolver
+from sources import SourceRegistry, YouTubeSource
+import sources
+import threading
+
+def items(n):
+    return [{'id': f"vid{i:08d}", 'url': f"https://www.youtube.com/watch?v=vid{i:08d}"} for i in range(n)]
+
+def validate(tmp_path, batch):
+    registry = SourceRegistry()
+    youtube = registry.register(YouTubeSource(Resolver()))
+    futures = []
+    submit = youtube.submit
+    youtube.submit = lambda *args, **kwargs: futures.append(submit(*args, **kwargs)) or futures[-1]
+    index = AvailabilityIndex(registry, str(tmp_path / "availability.json"))
+    index.validate(batch)
+    # callbacks run in the order they were added, so once ours ran the index's had too
+    done = []
+    for future in futures:
+        finished = threading.Event()
+        future.add_done_callback(lambda f, finished=finished: finished.set())
+        done.append(finished)
+    assert all(finished.wait(5) for finished in done)
+    return index
+
+def test_failed_request_marks_nothing_dead(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_YTDLP_LATENCY", "0")
+    monkeypatch.setenv("FAKE_YTDLP_FAIL_RATE", "1")
+    index = validate(tmp_path, items(60))
+    assert not index.dead
+    assert not index.checked
+
+def test_ids_left_out_of_a_good_response_are_dead(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_YTDLP_LATENCY", "0")
+    batch = items(3)
+    monkeypatch.setattr(sources, "fetch_metadata", lambda ids: {ids[0]: {}, ids[2]: {}})
+    index = validate(tmp_path, batch)
+    assert index.dead == {batch[1]['id']}
@@ -0,0 +1,29 @@
+import pytest
+import resolver
+from resolver import Resolver, UnavailableError
+
+def test_format_miss_falls_through_to_best(monkeypatch):
+    tried = []
+
+    def get_audio_url(url, fmt, profile=None):
+        tried.append(fmt)
+        if fmt != "best":
+            raise Exception("ERROR: [youtube] abc: Requested format is not available. Use --list-formats")
+        return "https://rr1.googlevideo.com/videoplayback?expire=9999999999"
+
+    monkeypatch.setattr(resolver, "get_audio_url", get_audio_url)
+    r = Resolver(formats=["bestaudio/best", "bestaudio[ext=m4a]", "best"], backoff=0)
+    assert r.resolve("https://www.youtube.com/watch?v=abc").startswith("https://rr1.googlevideo.com/")
+    assert tried == ["bestaudio/best", "bestaudio[ext=m4a]", "best"]
+
+def test_unavailable_video_stops_at_first_format(monkeypatch):
+    tried = []
+
+    def get_audio_url(url, fmt, profile=None):
+        tried.append(fmt)
+        raise Exception("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader")
+
+    monkeypatch.setattr(resolver, "get_audio_url", get_audio_url)
+    with pytest.raises(UnavailableError):
+        Resolver(formats=["bestaudio/best", "best"], backoff=0).resolve("https://www.youtube.com/watch?v=abc")
+    assert tried == ["bestaudio/best"]
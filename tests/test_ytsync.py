@@ -0,0 +1,56 @@
+from playlist import load_playlist, save_playlist
+from youtube_api import FakeYouTubeApi
+from ytsync import SyncError, YouTubeApi, sync_playlist
+import pytest
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "playlists").mkdir()
+    (tmp_path / "token.json").write_text('{"token": "x"}')
+    fake = FakeYouTubeApi().start()
+    yield fake
+    fake.stop()
+
+def client(fake):
+    return YouTubeApi(base=fake.base, token_file="token.json")
+
+def entry(video_id):
+    return {'title': video_id, 'id': video_id, 'url': f"https://www.youtube.com/watch?v={video_id}"}
+
+def remote_ids(fake, playlist_id):
+    return {item['videoId'] for item in fake.playlists[playlist_id]}
+
+def test_edits_on_either_side_reach_the_other(remote):
+    remote.create("PL", 6)
+    api = client(remote)
+    sync_playlist("mine", "PL", api)
+    remote.insert("PL", "remoteadd")
+    remote.delete(remote.playlists["PL"][1]['id'])
+    local = [e for e in load_playlist("mine") if e['id'] != "vid000002"] + [entry("localadd")]
+    save_playlist("mine", local)
+
+    result = sync_playlist("mine", "PL", api)
+
+    assert (result['pulled'], result['dropped'], result['pushed'], result['deleted']) == (1, 1, 1, 1)
+    expected = {"vid000000", "vid000003", "vid000004", "vid000005", "remoteadd", "localadd"}
+    assert {e['id'] for e in load_playlist("mine")} == expected
+    assert remote_ids(remote, "PL") == expected
+
+def test_unchanged_resync_reuses_every_page(remote):
+    remote.create("PL", 120)
+    api = client(remote)
+    first = sync_playlist("mine", "PL", api)
+
+    result = sync_playlist("mine", "PL", api)
+
+    assert result['pages'] == first['pages'] == 3
+    assert result['reused'] == 3
+    assert remote.not_modified == 3
+    assert not result['wrote']
+
+def test_corrupt_playlist_is_a_sync_error(remote, tmp_path):
+    remote.create("PL", 3)
+    (tmp_path / "playlists" / "mine.json").write_text("[{")
+    with pytest.raises(SyncError):
+        sync_playlist("mine", "PL", client(remote))
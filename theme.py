@@ -0,0 +1,31 @@
+from config import THEME, THEMES_DIR
+from session import read_json
+import curses
+import os
+
+DEFAULT_THEME = {
+    "colors": {},
+    "symbols": {},
+    "progress": {"width": 32, "fill": "█", "empty": " "},
+}
+
+def load_theme(name=THEME):
+    theme = read_json(os.path.join(THEMES_DIR, name + ".json")) or {}
+    return {key: dict(default, **theme.get(key, {})) for key, default in DEFAULT_THEME.items()}
+
+def init_colors(theme):
+    # returns curses attributes by color name, empty on terminals without color
+    try:
+        if not curses.has_colors():
+            return {}
+        curses.start_color()
+    except curses.error:
+        return {}
+    attrs = {}
+    for pair, (name, color) in enumerate(sorted(theme["colors"].items()), 1):
+        try:
+            curses.init_pair(pair, color.get("fg", 7), color.get("bg", 0))
+        except curses.error:
+            continue
+        attrs[name] = curses.color_pair(pair)
+    return attrs
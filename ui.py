@@ -1,7 +1,24 @@
 from player import MusicPlayer
-from youtube import search_youtube
-from playlist import list_playlists
+from youtube import is_playlist_url
+from playlist import list_playlists, load_playlist
+from ytsync import playlist_id_from, linked_playlist
+from metadata import format_duration
+from search import default_pipeline
+from fuzzy import IncrementalFilter, matches, positions, step
+from bisect import bisect_left
+from metrics import metrics
+from scheduler import INTERACTIVE
+from layout import layout_for, truncate
+from keymap import load_keymap, coalesce
+from theme import load_theme, init_colors
+from visualizer import Spectrum
+from config import METRICS_EXPORT_PATH, AUDIO_PROFILE, VISUALIZER_FPS
+from collections import deque
 import curses
+import threading
+
+# keys taken from curses per frame, enough for any auto-repeat rate
+MAX_KEYS_PER_FRAME = 256
 
 class NcursesUI:
     def __init__(self, stdscr):
@@ -9,55 +26,135 @@ class NcursesUI:
         self.player = MusicPlayer()
         self.mode = "home"
         self.selected = 0
-        self.search_results = []
+        self.searcher = default_pipeline(self.player)
         self.multi_select = set()
         self.queue_selected = 0
+        self.show_metrics = False
+        self.metrics_always_on = metrics.enabled
+        self.metrics_status = None
+        self.player.library.scan_async()
+        self.player.restore_session()
+        self.player.session.start(self.player)
+        self.playlist_names = []
+        self.playlist_entries = {}
+        self.summaries = {}
+        self.filter_text = ""
+        self.filter_typing = False
+        self.queue_filter = IncrementalFilter(self.player.queue_index)
+        self.queue_rows = None
+        self.queue_rows_key = None
+        self.queue_marked = set()
+        self.queue_anchor = None
+        self.layout = None
+        self.theme = load_theme()
+        self.colors = init_colors(self.theme)
+        self.spectrum = Spectrum()
+        self.keymap = load_keymap()
+        self.pending_keys = deque()
+        self.running = True
 
     def draw(self):
-        self.stdscr.clear()
-        if self.mode == "home":
-            self.draw_home()
-        elif self.mode == "search":
-            self.draw_search()
-        elif self.mode == "queue":
-            self.draw_queue()
-        elif self.mode == "control":
-            self.draw_controls()
-        elif self.mode == "playlist":
-            self.draw_playlist()
-        elif self.mode == "info":
-            self.draw_info()
+        if self.layout is None:
+            self.layout = layout_for(*self.stdscr.getmaxyx())
+        self.stdscr.erase()
+        with metrics.timer('draw'):
+            if self.mode == "home":
+                self.draw_home()
+            elif self.mode == "search":
+                self.draw_search()
+            elif self.mode == "queue":
+                self.draw_queue()
+            elif self.mode == "control":
+                self.draw_controls()
+            elif self.mode == "playlist":
+                self.draw_playlist()
+            elif self.mode == "info":
+                self.draw_info()
+            elif self.mode == "visualizer":
+                self.draw_visualizer()
+        if self.show_metrics:
+            self.draw_metrics()
         self.stdscr.refresh()
 
+    def put(self, y, x, text, attr=0):
+        layout = self.layout
+        if not layout.fits(y) or x >= layout.width:
+            return
+        # curses refuses to write the bottom-right cell, keep the last column free
+        try:
+            self.stdscr.addstr(y, x, truncate(text, layout.width - x - 1), attr)
+        except curses.error:
+            pass
+
+    def draw_lines(self, lines, top=None):
+        top = self.layout.body_top if top is None else top
+        for y, line in enumerate(lines[:max(0, self.layout.footer - top)], top):
+            self.put(y, 0, line)
+
     def draw_home(self):
-        self.stdscr.addstr(0, 0, "Python Music Player (yt-dlp) [Home]")
-        self.stdscr.addstr(2, 0, "A: Add first YouTube search result to queue")
-        self.stdscr.addstr(3, 0, "/: Search YouTube and add selection to queue")
-        self.stdscr.addstr(4, 0, "S: Save queue as playlist")
-        self.stdscr.addstr(5, 0, "O: Load playlist")
-        self.stdscr.addstr(6, 0, "F: Smart Fill")
-        self.stdscr.addstr(7, 0, "?: Show keyboard controls")
-        self.stdscr.addstr(8, 0, "L: Show queue")
-        self.stdscr.addstr(9, 0, "Y: Toggle auto save")
-        self.stdscr.addstr(10,0, "Q: Quit")
-        self.stdscr.addstr(11,0, "ESC: Home")
-        self.stdscr.addstr(13,0, f"Playing: {self.player.get_current_song()['title'] if self.player.get_current_song() else 'None'}")
-        self.stdscr.addstr(14,0, f"Auto Save: {'ON' if self.player.auto_save else 'OFF'}")
+        song = self.player.get_current_song()
+        self.put(0, 0, "Python Music Player (yt-dlp) [Home]")
+        lines = [
+            f"Playing: {song['title'] if song else 'None'}",
+            f"Auto Save: {'ON' if self.player.auto_save else 'OFF'}",
+        ]
+        if self.player.import_status:
+            lines.append(self.player.import_status)
+        if self.player.status:
+            lines.append(self.player.status)
+        elif self.player.library.scanning:
+            lines.append(self.player.library.status or "Scanning library...")
+        menu = [
+            "A: Add first YouTube search result to queue",
+            "/: Search YouTube and add selection to queue",
+            "S: Save queue as playlist",
+            "O: Load playlist",
+            "F: Smart Fill",
+            "?: Show keyboard controls",
+            "L: Show queue",
+            "Y: Toggle auto save",
+            "Q: Quit",
+            "ESC: Home",
+            "U: Import YouTube playlist/channel URL",
+            "V: Spectrum visualizer",
+            "W: Sync playlist with YouTube",
+        ]
+        # on short terminals the menu gives way to the now-playing lines
+        room = max(0, self.layout.footer - self.layout.body_top - len(lines) - 1)
+        self.draw_lines(menu[:room] + [""] + lines if room else lines)
 
     def draw_search(self):
-        self.stdscr.addstr(0, 0, "Search YouTube. Enter query:")
-        for i, result in enumerate(self.search_results):
+        results = self.searcher.results
+        # checked every frame rather than on cursor moves, so a jump to the end, a page
+        # down or a first page shorter than the screen also pull the next page in
+        if len(results) - self.selected <= self.layout.body_rows:
+            self.searcher.more()
+        if self.searcher.loading_more:
+            status = f"{len(results)} results, loading more..."
+        else:
+            status = "searching..." if self.searcher.searching else f"{len(results)} results"
+        self.put(0, 0, f"Search: {self.searcher.query} ({status})")
+        for y, i in self.visible_window(self.selected):
             prefix = "> " if i == self.selected else "  "
-            selected_tag = "[x]" if i in self.multi_select else "[ ]"
-            self.stdscr.addstr(2 + i, 0, f"{prefix}{selected_tag} {result['title']}")
-        self.stdscr.addstr(13, 0, "Enter: Add selected | Space: Multi-select | ESC: Cancel")
+            selected_tag = "[x]" if results[i]['id'] in self.multi_select else "[ ]"
+            self.put(y, 0, f"{prefix}{selected_tag} {results[i]['title']}")
+        self.draw_filter()
+        self.put(self.layout.footer, 0, "Enter: Add selected | Space: Multi-select | /: Filter | ESC: Cancel")
 
     def draw_queue(self):
-        self.stdscr.addstr(0, 0, "Queue:")
-        for i, item in enumerate(self.player.queue):
+        queue = list(self.player.queue)
+        marked = f", {len(self.queue_marked)} selected" if self.queue_marked else ""
+        total = self.summary('queue', (self.player.queue_version, self.player.metadata.version), queue)
+        self.put(0, 0, f"Queue: {total}{marked}")
+        for y, i in self.visible_window(self.queue_selected):
             prefix = ">" if i == self.queue_selected else " "
-            self.stdscr.addstr(2 + i, 0, f"{prefix} {item['title']}")
-        self.stdscr.addstr(13, 0, "Enter: Play | Del/Backspace: Remove | Z: Up | X: Down | I: Info | ESC: Home")
+            tag = "[x] " if id(queue[i]) in self.queue_marked else ""
+            if self.player.availability.is_dead(queue[i]):
+                self.put(y, 0, f"{prefix} {tag}✗ {queue[i]['title']} (unavailable)", curses.A_DIM)
+            else:
+                self.put(y, 0, f"{prefix} {tag}{queue[i]['title']}")
+        self.draw_filter()
+        self.put(self.layout.footer, 0, "Enter: Play | Space/V: Select | Del: Remove | P: Play next | G: Move to | D: Dedupe | S: Sort | Z/X: Up/Down | </>: Undo/Redo | I: Info | /: Filter | ESC: Home")
 
     def draw_controls(self):
         controls = [
@@ -77,144 +174,508 @@ class NcursesUI:
             "R: Repeat one",
             "T: Repeat queue",
             "H: Shuffle queue",
+            "U: Import YouTube playlist/channel URL",
+            "M: Toggle performance overlay",
+            "V: Spectrum visualizer",
+            "W: Sync playlist with YouTube",
+            "</>: Undo/redo queue edits",
+            "Queue: Space/V select, P play next, G move, D dedupe, S sort",
         ]
-        self.stdscr.addstr(0, 0, "Keyboard Controls:")
+        self.put(0, 0, "Keyboard Controls:")
+        # spill into a second column when the terminal is short but wide
+        rows = max(1, self.layout.footer - self.layout.body_top)
+        column = max(map(len, controls)) + 2
         for i, c in enumerate(controls):
-            self.stdscr.addstr(2 + i, 0, c)
-        self.stdscr.addstr(20, 0, "ESC: Home")
+            self.put(self.layout.body_top + i % rows, (i // rows) * column, c)
+        self.put(self.layout.footer, 0, "ESC: Home")
 
     def draw_playlist(self):
-        names = list_playlists()
-        for i, name in enumerate(names):
+        for y, i in self.visible_window(self.selected):
             prefix = ">" if i == self.selected else " "
-            self.stdscr.addstr(2 + i, 0, f"{prefix} {name}")
-        self.stdscr.addstr(0, 0, "Playlists: Enter to load | ESC: Home")
+            name = self.playlist_names[i]
+            entries = self.playlist_entries.get(name)
+            total = f"  ({self.summary(name, self.player.metadata.version, entries)})" if entries is not None else ""
+            self.put(y, 0, f"{prefix} {name}{total}")
+        self.put(0, 0, "Playlists: Enter to load | /: Filter | ESC: Home")
+        self.draw_filter()
 
     def draw_info(self):
         song = self.player.get_current_song()
+        lines = []
         if song:
-            self.stdscr.addstr(0, 0, f"Title: {song['title']}")
-            self.stdscr.addstr(1, 0, f"ID: {song['id']}")
-            self.stdscr.addstr(2, 0, f"URL: {song['url']}")
-        self.stdscr.addstr(4, 0, "ESC: Back")
+            lines += [f"Title: {song['title']}", f"ID: {song['id']}", f"URL: {song['url']}"]
+            meta = self.player.metadata.get(song) or {}
+            if meta.get('duration'):
+                lines.append(f"Duration: {format_duration(meta['duration'])}")
+            if meta.get('channel'):
+                lines.append(f"Channel: {meta['channel']}")
+            if meta.get('upload_date'):
+                date = meta['upload_date']
+                lines.append(f"Uploaded: {date[:4]}-{date[4:6]}-{date[6:]}")
+        kbps = self.player.throughput.kbps
+        measured = f", {kbps:.0f} kbps measured" if kbps is not None else ""
+        lines.append(f"Quality: {self.player.audio_profile()['name']} ({AUDIO_PROFILE}{measured})")
+        self.draw_lines(lines, top=0)
+        self.put(self.layout.footer, 0, "ESC: Back")
+
+    def draw_visualizer(self):
+        player = self.player
+        # a paused (SIGSTOPped) mpv can't answer IPC, so the tap waits for it to resume;
+        # one already attached stays and the bars just hold still
+        if not player.is_paused:
+            self.spectrum.sync(player.process)
+        song = player.get_current_song()
+        self.put(0, 0, f"Visualizer: {song['title'] if song else 'None'}", self.colors.get('menu', 0))
+        self.put(self.layout.footer, 0, "ESC: Home")
+        if not self.spectrum.available:
+            self.put(self.layout.body_top, 0, "the visualizer needs mpv built with lavfi audio filters")
+            return
+        levels = self.spectrum.levels
+        fill = self.theme['progress']['fill']
+        empty = self.theme['progress']['empty']
+        height = self.layout.body_rows
+        bar = max(1, (self.layout.width - 1) // len(levels) - 1)
+        heights = [round(level * height) for level in levels]
+        attr = self.colors.get('progress', 0)
+        for row in range(height):
+            need = height - row
+            self.put(self.layout.body_top + row, 0, " ".join((fill if h >= need else empty) * bar for h in heights), attr)
+
+    def summary(self, name, stamp, items):
+        # totals only change when the list or the metadata cache does
+        cached = self.summaries.get(name)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, self.player.metadata.summary(items))
+            self.summaries[name] = cached
+        return cached[1]
+
+    def load_playlist_entries(self, names):
+        for name in names:
+            try:
+                entries = load_playlist(name)
+            except (OSError, ValueError):
+                continue
+            self.summaries.pop(name, None)
+            self.playlist_entries[name] = entries
+            self.player.metadata.request(entries)
+
+    def visible_rows(self):
+        if self.mode == "queue":
+            queue = self.player.queue
+            if not self.filter_text:
+                return range(len(queue))
+            key = (self.filter_text, len(queue), self.player.queue_index.version)
+            if key != self.queue_rows_key:
+                self.queue_rows = positions(list(queue), self.queue_filter.update(self.filter_text))
+                self.queue_rows_key = key
+            return self.queue_rows
+        if self.mode == "search":
+            titles = [r['title'] for r in self.searcher.results]
+        else:
+            titles = self.playlist_names
+        if not self.filter_text:
+            return range(len(titles))
+        return [i for i, title in enumerate(titles) if matches(self.filter_text, title)]
+
+    def visible_window(self, selected):
+        rows = self.visible_rows()
+        height = self.layout.body_rows
+        top = max(0, bisect_left(rows, selected) - height + 1)
+        return list(enumerate(rows[top:top + height], self.layout.body_top))
+
+    def move_selection(self, delta):
+        rows = self.visible_rows()
+        if self.mode == "queue":
+            self.queue_selected = step(rows, self.queue_selected, delta)
+        else:
+            self.selected = step(rows, self.selected, delta)
+
+    def draw_filter(self):
+        if self.filter_typing or self.filter_text:
+            cursor = "_" if self.filter_typing else ""
+            self.put(self.layout.filter, 0, f"/{self.filter_text}{cursor} ({len(self.visible_rows())} matches)")
+
+    def edit_filter(self, ch):
+        if ch == 27: # ESC
+            self.clear_filter()
+        elif ch == 10: # Enter
+            self.filter_typing = False
+        elif ch in (curses.KEY_BACKSPACE, 127, 8):
+            self.filter_text = self.filter_text[:-1]
+        elif ch == curses.KEY_UP:
+            self.move_selection(-1)
+        elif ch == curses.KEY_DOWN:
+            self.move_selection(1)
+        elif 32 <= ch < 127:
+            self.filter_text += chr(ch)
+        else:
+            return
+        self.move_selection(0)
+
+    def queue_targets(self):
+        if not self.queue_marked:
+            return [self.queue_selected] if self.visible_rows() else []
+        return [i for i, item in enumerate(self.player.queue) if id(item) in self.queue_marked]
+
+    def toggle_mark(self):
+        item = self.player.queue[self.queue_selected]
+        self.queue_marked ^= {id(item)}
+        self.queue_anchor = self.queue_selected
+
+    def mark_range(self):
+        rows = self.visible_rows()
+        anchor = self.queue_selected if self.queue_anchor is None else self.queue_anchor
+        low, high = sorted((anchor, self.queue_selected))
+        queue = self.player.queue
+        self.queue_marked.update(id(queue[i]) for i in rows[bisect_left(rows, low):bisect_left(rows, high + 1)])
+
+    def bulk_done(self, selected=None):
+        # marks hold object ids, which mean nothing once the queue is rebuilt
+        self.queue_marked = set()
+        self.queue_anchor = None
+        self.queue_rows_key = None
+        if selected is not None:
+            self.queue_selected = selected
+        self.move_selection(0)
+
+    def clear_filter(self):
+        self.filter_text = ""
+        self.filter_typing = False
+        self.queue_rows_key = None
+
+    def draw_metrics(self):
+        snapshot = metrics.snapshot()
+        lines = ["Performance | M: Hide | E: Export"]
+        for name, t in sorted(snapshot['timers'].items()):
+            lines.append(f"{name:<22} n={t['count']:<5} p50={t['p50']:.1f} p95={t['p95']:.1f} p99={t['p99']:.1f}ms")
+        for name, c in sorted(snapshot['caches'].items()):
+            lines.append(f"{name:<22} hit {c['ratio']:.0%} ({c['hits']}/{c['hits'] + c['misses']})")
+        if self.metrics_status:
+            lines.append(self.metrics_status)
+        x = self.layout.overlay_x
+        for i, line in enumerate(lines[:self.layout.height - 1]):
+            self.put(i, x, line.ljust(self.layout.overlay_width))
+
+    def toggle_metrics(self):
+        self.show_metrics = not self.show_metrics
+        # only collect while someone is looking, unless TUNESHELL_METRICS=1
+        metrics.enabled = self.show_metrics or self.metrics_always_on
+
+    def prompt(self, label, maxlen=30):
+        y = self.layout.status
+        self.put(y, 0, label)
+        maxlen = max(1, min(maxlen, self.layout.width - len(label) - 1))
+        self.stdscr.timeout(-1)
+        # keys typed ahead of the prompt in the same frame belong to it
+        for ch, count in reversed(self.pending_keys):
+            for _ in range(count):
+                curses.ungetch(ch)
+        self.pending_keys.clear()
+        curses.echo()
+        text = self.stdscr.getstr(y, len(label), maxlen).decode()
+        curses.noecho()
+        return text
+
+    def read_keys(self):
+        # block for the first key up to one frame, then take whatever else is already queued
+        ch = self.stdscr.getch()
+        if ch == -1:
+            return []
+        keys = [ch]
+        self.stdscr.timeout(0)
+        while len(keys) < MAX_KEYS_PER_FRAME:
+            ch = self.stdscr.getch()
+            if ch == -1:
+                break
+            keys.append(ch)
+        return keys
 
     def run(self):
         curses.curs_set(0)
-        self.draw()
-        while True:
+        while self.running:
             self.draw()
-            ch = self.stdscr.getch()
-            if self.mode == "home":
-                if ch == ord('A'):
-                    self.stdscr.addstr(15, 0, "Query: ")
-                    curses.echo()
-                    query = self.stdscr.getstr(15, 8, 30).decode()
-                    curses.noecho()
-                    results = search_youtube(query, 1)
-                    if results:
-                        self.player.add_to_queue(results[0])
-                elif ch == ord('/'):
-                    self.stdscr.addstr(15, 0, "Query: ")
-                    curses.echo()
-                    query = self.stdscr.getstr(15, 8, 30).decode()
-                    curses.noecho()
-                    self.search_results = search_youtube(query, 10)
-                    self.multi_select = set()
-                    self.selected = 0
-                    self.mode = "search"
-                elif ch == ord('S'):
-                    self.stdscr.addstr(15, 0, "Playlist name: ")
-                    curses.echo()
-                    name = self.stdscr.getstr(15, 15, 30).decode()
-                    curses.noecho()
-                    self.player.set_playlist_name(name)
-                    self.player.save_current_playlist()
-                    self.player.auto_save = True
-                elif ch == ord('O'):
-                    self.mode = "playlist"
-                    self.selected = 0
-                elif ch == ord('F'):
-                    self.player.smart_fill_enabled = True
-                elif ch == ord('?'):
-                    self.mode = "control"
-                elif ch == ord('L'):
-                    self.mode = "queue"
-                    self.queue_selected = 0
-                elif ch == ord('Y'):
-                    self.player.toggle_auto_save()
-                elif ch == 27: # ESC
-                    self.mode = "home"
-                elif ch == ord('Q'):
-                    self.player.stop()
-                    break
-                elif ch == ord(' '):
-                    if self.player.is_playing:
-                        if self.player.is_paused:
-                            self.player.resume()
-                        else:
-                            self.player.pause()
-                    else:
-                        self.player.play()
-                elif ch == curses.KEY_RIGHT:
-                    self.player.next()
-                elif ch == curses.KEY_LEFT:
-                    self.player.prev()
-                elif ch == ord('R'):
-                    self.player.repeat_one = not self.player.repeat_one
-                elif ch == ord('T'):
-                    self.player.repeat_queue = not self.player.repeat_queue
-                elif ch == ord('H'):
-                    self.player.shuffle = not self.player.shuffle
-            elif self.mode == "search":
-                if ch == curses.KEY_UP:
-                    self.selected = max(0, self.selected - 1)
-                elif ch == curses.KEY_DOWN:
-                    self.selected = min(len(self.search_results) - 1, self.selected + 1)
-                elif ch == ord(' '):
-                    if self.selected in self.multi_select:
-                        self.multi_select.remove(self.selected)
-                    else:
-                        self.multi_select.add(self.selected)
-                elif ch == 10: # Enter
-                    to_add = [self.search_results[i] for i in (self.multi_select if self.multi_select else [self.selected])]
-                    self.player.add_multiple_to_queue(to_add)
-                    self.mode = "home"
-                elif ch == 27: # ESC
-                    self.mode = "home"
-            elif self.mode == "queue":
-                if ch == curses.KEY_UP:
-                    self.queue_selected = max(0, self.queue_selected - 1)
-                elif ch == curses.KEY_DOWN:
-                    self.queue_selected = min(len(self.player.queue) - 1, self.queue_selected + 1)
-                elif ch == ord('Z'):
-                    self.player.move_up(self.queue_selected)
-                    self.queue_selected = max(0, self.queue_selected - 1)
-                elif ch == ord('X'):
-                    self.player.move_down(self.queue_selected)
-                    self.queue_selected = min(len(self.player.queue) - 1, self.queue_selected + 1)
-                elif ch == ord('I'):
-                    self.mode = "info"
-                elif ch == curses.KEY_DC or ch == 127:
-                    self.player.remove_from_queue(self.queue_selected)
-                    self.queue_selected = max(0, self.queue_selected - 1)
-                elif ch == 10: # Enter
-                    self.player.play(self.queue_selected)
-                elif ch == 27: # ESC
-                    self.mode = "home"
-            elif self.mode == "control":
-                if ch == 27:
-                    self.mode = "home"
-            elif self.mode == "playlist":
-                names = list_playlists()
-                if ch == curses.KEY_UP:
-                    self.selected = max(0, self.selected - 1)
-                elif ch == curses.KEY_DOWN:
-                    self.selected = min(len(names) - 1, self.selected + 1)
-                elif ch == 10: # Enter
-                    self.player.load_playlist(names[self.selected])
-                    self.mode = "home"
-                elif ch == 27:
-                    self.mode = "home"
-            elif self.mode == "info":
-                if ch == 27:
-                    self.mode = "queue"
\ No newline at end of file
+            # wake up periodically so background imports and streamed search results
+            # show up without a keypress; the visualizer redraws at its own frame rate
+            self.stdscr.timeout(1000 // VISUALIZER_FPS if self.mode == "visualizer" else 100)
+            self.process_keys(self.read_keys())
+
+    def process_keys(self, keys):
+        self.pending_keys = deque(coalesce(keys))
+        while self.pending_keys and self.running:
+            ch, count = self.pending_keys.popleft()
+            self.handle_key(ch, count)
+
+    def handle_key(self, ch, count):
+        if ch == curses.KEY_RESIZE:
+            # geometry is cached per size, only recompute it now
+            self.layout = None
+            return
+        if self.filter_typing:
+            for _ in range(count):
+                self.edit_filter(ch)
+            return
+        action = self.keymap.get(self.mode, {}).get(ch) or self.keymap['global'].get(ch)
+        handler = getattr(self, 'act_' + action, None) if action else None
+        if handler:
+            handler(count)
+
+    def act_toggle_metrics(self, count):
+        self.toggle_metrics()
+
+    def act_export_metrics(self, count):
+        if self.show_metrics:
+            exported = metrics.export_jsonl(METRICS_EXPORT_PATH)
+            self.metrics_status = f"Exported {exported} samples to {METRICS_EXPORT_PATH}"
+
+    def act_filter(self, count):
+        self.filter_typing = True
+
+    def act_home(self, count):
+        self.mode = "home"
+
+    def act_add_first(self, count):
+        query = self.prompt("Query: ")
+        youtube = self.player.sources['youtube']
+        results = youtube.run(youtube.search, query, 1, priority=INTERACTIVE)
+        if results:
+            self.player.add_to_queue(results[0])
+
+    def act_search(self, count):
+        query = self.prompt("Query: ")
+        self.searcher.search(query)
+        self.multi_select = set()
+        self.selected = 0
+        self.mode = "search"
+
+    def act_save_playlist(self, count):
+        name = self.prompt("Playlist name: ")
+        self.player.set_playlist_name(name)
+        self.player.save_current_playlist()
+        self.player.auto_save = True
+
+    def act_open_playlists(self, count):
+        self.mode = "playlist"
+        self.playlist_names = list_playlists()
+        self.selected = 0
+        threading.Thread(target=self.load_playlist_entries, args=(self.playlist_names,), daemon=True).start()
+
+    def act_smart_fill(self, count):
+        self.player.smart_fill_enabled = True
+
+    def act_controls(self, count):
+        self.mode = "control"
+
+    def act_show_queue(self, count):
+        if self.mode != "info":
+            self.queue_selected = 0
+        self.mode = "queue"
+
+    def act_toggle_auto_save(self, count):
+        self.player.toggle_auto_save()
+
+    def act_visualizer(self, count):
+        self.mode = "visualizer"
+
+    def act_close_visualizer(self, count):
+        self.spectrum.stop()
+        self.mode = "home"
+
+    def act_quit(self, count):
+        self.spectrum.stop()
+        self.player.session.save(self.player)
+        self.player.stop()
+        self.running = False
+
+    def switch_track(self, fn, *args):
+        # resolving can take a few retries on a bad network; the UI keeps drawing meanwhile
+        # and the player's transition lock puts the switches in order
+        threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def act_play_pause(self, count):
+        if self.player.is_playing:
+            if self.player.is_paused:
+                self.player.resume()
+            else:
+                self.player.pause()
+        else:
+            self.switch_track(self.player.play)
+
+    def act_next(self, count):
+        player = self.player
+        if count > 1 and not player.shuffle and player.current_index is not None and player.queue:
+            # held down: jump straight to the track it would have ended on
+            self.switch_track(player.play, (player.current_index + count) % len(player.queue))
+        else:
+            self.switch_track(player.next)
+
+    def act_prev(self, count):
+        player = self.player
+        if count > 1 and not player.shuffle and player.current_index is not None and player.queue:
+            self.switch_track(player.play, (player.current_index - count) % len(player.queue))
+        else:
+            self.switch_track(player.prev)
+
+    def act_repeat_one(self, count):
+        self.player.repeat_one = not self.player.repeat_one
+
+    def act_repeat_queue(self, count):
+        self.player.repeat_queue = not self.player.repeat_queue
+
+    def act_shuffle(self, count):
+        self.player.toggle_shuffle()
+
+    def act_import_playlist(self, count):
+        url = self.prompt("Playlist URL: ", 200).strip()
+        if is_playlist_url(url):
+            self.player.import_playlist(url)
+        else:
+            self.player.import_status = "Not a playlist or channel URL"
+
+    def act_sync_playlist(self, count):
+        if not self.player.playlist_name:
+            name = self.prompt("Playlist name: ").strip()
+            if not name:
+                return
+            self.player.set_playlist_name(name)
+        linked = linked_playlist(self.player.playlist_name)
+        text = self.prompt(f"YouTube playlist URL or ID [{linked or ''}]: ", 200)
+        playlist_id = playlist_id_from(text) or linked
+        if playlist_id:
+            self.player.sync_playlist(playlist_id)
+        else:
+            self.player.import_status = "No YouTube playlist to sync with"
+
+    def act_undo(self, count):
+        for _ in range(count):
+            step = self.player.undo()
+            if step is None:
+                self.player.status = "Nothing to undo"
+                break
+            self.player.status = f"Undid {step.label}"
+        self.bulk_done()
+
+    def act_redo(self, count):
+        for _ in range(count):
+            step = self.player.redo()
+            if step is None:
+                self.player.status = "Nothing to redo"
+                break
+            self.player.status = f"Redid {step.label}"
+        self.bulk_done()
+
+    def act_up(self, count):
+        self.move_selection(-count)
+
+    def act_down(self, count):
+        self.move_selection(count)
+
+    def act_page_up(self, count):
+        self.move_selection(-count * max(1, self.layout.body_rows))
+
+    def act_page_down(self, count):
+        self.move_selection(count * max(1, self.layout.body_rows))
+
+    def act_toggle_select(self, count):
+        if self.visible_rows():
+            video_id = self.searcher.results[self.selected]['id']
+            if video_id in self.multi_select:
+                self.multi_select.remove(video_id)
+            else:
+                self.multi_select.add(video_id)
+
+    def act_add_selected(self, count):
+        if not self.visible_rows():
+            return
+        results = self.searcher.results
+        if self.multi_select:
+            to_add = [r for r in results if r['id'] in self.multi_select]
+        else:
+            to_add = [results[self.selected]]
+        self.player.add_multiple_to_queue(to_add)
+        self.clear_filter()
+        self.mode = "home"
+
+    def act_close(self, count):
+        self.clear_filter()
+        self.mode = "home"
+
+    def act_move_up(self, count):
+        # a held Z becomes one block move and one save
+        queue = self.player.queue
+        if not queue:
+            return
+        target = max(0, self.queue_selected - count)
+        if target != self.queue_selected:
+            self.player.move_block([self.queue_selected], target)
+            self.queue_selected = target
+            self.queue_rows_key = None
+
+    def act_move_down(self, count):
+        queue = self.player.queue
+        if not queue:
+            return
+        target = min(len(queue) - 1, self.queue_selected + count)
+        if target != self.queue_selected:
+            self.player.move_block([self.queue_selected], target)
+            self.queue_selected = target
+            self.queue_rows_key = None
+
+    def act_info(self, count):
+        self.mode = "info"
+
+    def act_remove(self, count):
+        if self.queue_marked:
+            targets = self.queue_targets()
+            self.player.remove_many(targets)
+            self.bulk_done(max(0, targets[0] - 1))
+        elif self.visible_rows():
+            rows = self.visible_rows()
+            # a held Del removes the run of visible rows from the selection down, in one save
+            start = bisect_left(rows, self.queue_selected)
+            targets = list(rows[start:start + count])
+            self.player.remove_many(targets)
+            self.bulk_done(max(0, self.queue_selected - 1))
+
+    def act_mark(self, count):
+        if self.visible_rows():
+            self.toggle_mark()
+
+    def act_mark_range(self, count):
+        if self.visible_rows():
+            self.mark_range()
+
+    def act_play_next(self, count):
+        if self.visible_rows():
+            self.bulk_done(self.player.play_next(self.queue_targets()))
+
+    def act_move_to(self, count):
+        if self.visible_rows():
+            position = self.prompt("Move to position: ", 8).strip()
+            if position.isdigit():
+                self.bulk_done(self.player.move_block(self.queue_targets(), int(position) - 1))
+
+    def act_dedupe(self, count):
+        removed = self.player.dedupe()
+        self.player.status = f"Removed {removed} duplicates"
+        self.bulk_done()
+
+    def act_sort(self, count):
+        self.player.sort_by_title(self.queue_targets() if self.queue_marked else None)
+        self.bulk_done()
+
+    def act_play_selected(self, count):
+        if self.visible_rows():
+            self.switch_track(self.player.play, self.queue_selected)
+
+    def act_close_queue(self, count):
+        if self.queue_marked:
+            self.bulk_done()
+            return
+        self.clear_filter()
+        self.mode = "home"
+
+    def act_load_playlist(self, count):
+        if self.visible_rows():
+            self.player.load_playlist(self.playlist_names[self.selected])
+            self.clear_filter()
+            self.mode = "home"
\ No newline at end of file
@@ -0,0 +1,62 @@
+from config import UNDO_LIMIT
+from collections import deque
+
+class Step:
+    __slots__ = ('label', 'before', 'after', 'added', 'removed', 'replaced', 'context')
+
+    def __init__(self, label, before, after, added, removed, replaced, context=None):
+        self.label = label
+        self.before = before
+        self.after = after
+        self.added = added
+        self.removed = removed
+        self.replaced = replaced
+        # (before, after) of whatever else the edit changed, e.g. which playlist is open
+        self.context = context
+
+class EditHistory:
+    # queue versions are persistent sequence roots, so a step is two pointers plus
+    # the tracks it added and removed; the roots share everything they didn't touch
+    def __init__(self, root=None, limit=UNDO_LIMIT):
+        self.done = deque(maxlen=limit)
+        self.undone = []
+        self.root = root
+
+    def reset(self, root):
+        self.done.clear()
+        self.undone.clear()
+        self.root = root
+
+    def record(self, label, root, added=(), removed=(), replaced=False, merge=False, context=None):
+        if root is self.root:
+            return
+        last = self.done[-1] if self.done else None
+        if merge and last and last.label == label and last.after is self.root and not last.replaced and not context:
+            last.after = root
+            last.added.extend(added)
+            last.removed.extend(removed)
+        else:
+            self.done.append(Step(label, self.root, root, list(added), list(removed), replaced, context))
+        self.undone.clear()
+        self.root = root
+
+    def follow(self, root):
+        # a change the player made on its own: later steps start from it, but it
+        # isn't a step the user can undo
+        self.root = root
+
+    def undo(self):
+        if not self.done:
+            return None
+        step = self.done.pop()
+        self.undone.append(step)
+        self.root = step.before
+        return step
+
+    def redo(self):
+        if not self.undone:
+            return None
+        step = self.undone.pop()
+        self.done.append(step)
+        self.root = step.after
+        return step
@@ -0,0 +1,98 @@
+from config import VISUALIZER_FPS, VISUALIZER_BANDS
+import math
+import threading
+import time
+
+# dB range mapped onto the bar height
+FLOOR_DB = -60.0
+# fraction of the previous level kept per frame, so bars fall instead of flicker
+DECAY = 0.7
+LABEL = "viz"
+LOWEST = 40.0
+HIGHEST = 16000.0
+
+def band_graph(bands):
+    # a tap inside mpv's own filter chain: a mono copy is split into log-spaced
+    # bandpass filters, merged as extra channels next to the music so astats
+    # measures every band in one pass, and pan hands only the music back
+    ratio = (HIGHEST / LOWEST) ** (1 / (bands - 1))
+    width = math.log2(ratio)
+    split = "".join(f"[s{i}]" for i in range(bands))
+    filters = ["aformat=channel_layouts=stereo,asplit=2[main][side]",
+               f"[side]pan=mono|c0=0.5*c0+0.5*c1,asplit={bands}{split}"]
+    for i in range(bands):
+        filters.append(f"[s{i}]bandpass=f={LOWEST * ratio ** i:.0f}:width_type=o:w={width:.3f}[b{i}]")
+    merged = "".join(f"[b{i}]" for i in range(bands))
+    filters.append(f"[main]{merged}amerge=inputs={bands + 1},"
+                   "astats=metadata=1:reset=1:measure_perchannel=RMS_level:measure_overall=none,"
+                   "pan=stereo|c0=c0|c1=c1")
+    return ";".join(filters)
+
+class Spectrum:
+    # reads the band levels mpv's filter chain measures for the audio it is
+    # playing, so nothing is downloaded or decoded a second time
+    def __init__(self, bands=VISUALIZER_BANDS, fps=VISUALIZER_FPS):
+        self.bands = bands
+        self.fps = fps
+        graph = band_graph(bands)
+        # mpv's %length% quoting, the graph is full of brackets and commas
+        self.filter = f"@{LABEL}:lavfi=graph=%{len(graph)}%{graph}"
+        # band i is merged in after the two music channels, astats counts from 1
+        self.keys = [f"lavfi.astats.{i + 3}.RMS_level" for i in range(bands)]
+        self.levels = [0.0] * bands
+        self.version = 0
+        self.process = None
+        # the process a tap couldn't be added to, not asked again
+        self.refused = None
+        self.available = True
+
+    def sync(self, process):
+        # called every frame with the mpv process playing now; a new one, from a
+        # track change, repeat-one or a resume after expiry, gets its own tap
+        if process is self.process or process is self.refused:
+            return
+        self.stop()
+        if process is None or process.poll() is not None:
+            return
+        if process.get_property('af') is None:
+            # its IPC socket isn't up yet, try again next frame
+            return
+        process.command('af', 'add', self.filter)
+        if not any(f.get('label') == LABEL for f in process.get_property('af') or []):
+            # mpv built without lavfi, or an ffmpeg too old for the graph
+            self.refused = process
+            self.available = False
+            return
+        self.available = True
+        self.process = process
+        threading.Thread(target=self._poll, args=(process,), daemon=True).start()
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            process.command('af', 'remove', f"@{LABEL}")
+        self.levels = [0.0] * self.bands
+
+    def _poll(self, process):
+        while process is self.process and process.poll() is None:
+            started = time.monotonic()
+            metadata = process.get_property(f"af-metadata/{LABEL}")
+            if metadata:
+                self.levels = self._levels(metadata)
+                self.version += 1
+            time.sleep(max(0.0, 1 / self.fps - (time.monotonic() - started)))
+        if process is self.process:
+            # it exited on its own; the next sync attaches to whatever plays next
+            self.process = None
+            self.levels = [0.0] * self.bands
+
+    def _levels(self, metadata):
+        levels = []
+        for key, previous in zip(self.keys, self.levels):
+            try:
+                db = float(metadata.get(key, "-inf"))
+            except ValueError:
+                db = -math.inf
+            level = min(1.0, max(0.0, (db - FLOOR_DB) / -FLOOR_DB))
+            levels.append(max(level, previous * DECAY))
+        return levels
@@ -1,6 +1,22 @@
 import yt_dlp
+import time
+from urllib.parse import quote_plus
+from metrics import metrics
+from quality import pick_audio_format
 
-def search_youtube(query: str, max_results=10):
+class MetadataError(Exception):
+    pass
+
+def _entry(e):
+    return {
+        'title': e.get('title') or e['id'],
+        'id': e['id'],
+        'url': f"https://www.youtube.com/watch?v={e['id']}"
+    }
+
+def search_youtube(query: str, max_results=10, start=0):
+    # a search can't start at an offset: yt-dlp re-walks every continuation
+    # (about 20 results each) before start, so later pages come from iter_search
     ydl_opts = {
         'quiet': True,
         'extract_flat': True,
@@ -9,30 +25,128 @@ def search_youtube(query: str, max_results=10):
         'noplaylist': True,
         'skip_download': True,
         'dump_single_json': True,
+        'playliststart': start + 1,
+        'playlistend': start + max_results,
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(f'ytsearch{max_results}:{query}', download=False)
+    with metrics.timer('search.youtube'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.extract_info(f'ytsearch{start + max_results}:{query}', download=False)
         entries = result['entries']
-        return [{
-            'title': e['title'],
-            'id': e['id'],
-            'url': f"https://www.youtube.com/watch?v={e['id']}"
-        } for e in entries]
+        return [_entry(e) for e in entries]
 
-def get_audio_url(video_url: str):
+def search_youtube_music(query: str, max_results=10, start=0):
     ydl_opts = {
         'quiet': True,
-        'format': 'bestaudio/best',
+        'extract_flat': True,
+        'skip_download': True,
+        'playliststart': start + 1,
+        'playlistend': start + max_results,
+    }
+    with metrics.timer('search.music'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.extract_info(f"https://music.youtube.com/search?q={quote_plus(query)}#songs", download=False)
+        return [_entry(e) for e in result.get('entries') or []
+                if e and e.get('id') and e.get('ie_key') != 'YoutubeTab']
+
+def _iter_search(url):
+    # one lazy walk over a search's results: process=False keeps yt-dlp's entry
+    # generator, so each continuation is requested only when a page reaches it
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': True,
+        'skip_download': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        for e in info.get('entries') or []:
+            if e and e.get('id') and e.get('ie_key') != 'YoutubeTab':
+                yield _entry(e)
+
+def iter_search_youtube(query: str):
+    return _iter_search(f'ytsearchall:{query}')
+
+def iter_search_youtube_music(query: str):
+    return _iter_search(f"https://music.youtube.com/search?q={quote_plus(query)}#songs")
+
+def is_playlist_url(url: str):
+    return url.startswith('http') and any(p in url for p in ('list=', '/channel/', '/c/', '/user/', '/@'))
+
+def _iter_flat_entries(ydl, url):
+    # process=False keeps yt-dlp's lazy entry generator, so each continuation
+    # page is fetched only when we reach it instead of all up front
+    info = ydl.extract_info(url, download=False, process=False)
+    while info.get('_type') in ('url', 'url_transparent') and info.get('ie_key') == 'YoutubeTab':
+        info = ydl.extract_info(info['url'], download=False, process=False)
+    for e in info.get('entries') or []:
+        if not e:
+            continue
+        if e.get('ie_key') == 'YoutubeTab' or e.get('_type') == 'playlist':
+            # channel root pages list their tabs (Videos, Shorts, ...) as entries
+            yield from _iter_flat_entries(ydl, e['url'])
+        elif e.get('id') and e.get('title') not in ('[Deleted video]', '[Private video]'):
+            yield _entry(e)
+
+def iter_playlist_pages(url: str, page_size=100, first_page=10):
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'lazy_playlist': True,
+        'ignoreerrors': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        page = []
+        limit = first_page
+        started = time.perf_counter()
+        for entry in _iter_flat_entries(ydl, url):
+            page.append(entry)
+            if len(page) >= limit:
+                metrics.observe('import.page', (time.perf_counter() - started) * 1000)
+                yield page
+                started = time.perf_counter()
+                page = []
+                limit = page_size
+        if page:
+            yield page
+
+def fetch_metadata(video_ids):
+    # watch_videos turns up to 50 ids into one anonymous playlist, so a flat
+    # extraction fetches them all in a single request
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'ignoreerrors': True,
+    }
+    url = "https://www.youtube.com/watch_videos?video_ids=" + ",".join(video_ids)
+    with metrics.timer('metadata'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if not info:
+        # ignoreerrors turns a failed request (network, 429, extractor) into None,
+        # which says nothing about whether the ids exist
+        raise MetadataError(f"metadata request for {len(video_ids)} ids failed")
+    found = {}
+    for e in info.get('entries') or []:
+        if e and e.get('id'):
+            found[e['id']] = {
+                'duration': e.get('duration'),
+                'channel': e.get('channel') or e.get('uploader'),
+                'upload_date': e.get('upload_date'),
+            }
+    return found
+
+def get_audio_url(video_url: str, fmt='bestaudio/best', profile=None):
+    ydl_opts = {
+        'quiet': True,
+        'format': fmt,
         'skip_download': True,
         'forceurl': True,
         'default_search': 'ytsearch',
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    with metrics.timer('resolve'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(video_url, download=False)
         if 'url' in info:
             return info['url']
         elif 'formats' in info:
-            for f in info['formats']:
-                if f.get('acodec', 'none') != 'none':
-                    return f['url']
+            f = pick_audio_format(info['formats'], profile or {})
+            if f:
+                return f['url']
     return None
\ No newline at end of file
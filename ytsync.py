@@ -0,0 +1,186 @@
+from config import YOUTUBE_API_BASE, YOUTUBE_TOKEN_FILE
+from playlist import PLAYLISTS_DIR, load_playlist, save_playlist
+from session import write_atomic, read_json
+from metrics import metrics
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, parse_qs
+import hashlib
+import json
+import os
+import urllib.error
+import urllib.request
+
+SYNC_DIR = os.path.join(PLAYLISTS_DIR, ".sync")
+PAGE_SIZE = 50
+# conditional page requests in flight at once while revalidating
+REVALIDATE_WORKERS = 8
+UNAVAILABLE_TITLES = ("Private video", "Deleted video")
+
+class SyncError(Exception):
+    pass
+
+def playlist_id_from(text):
+    text = text.strip()
+    if text.startswith("http"):
+        found = parse_qs(urlparse(text).query).get('list')
+        return found[0] if found else None
+    return text or None
+
+def content_hash(entries):
+    return hashlib.sha1("\n".join(e['id'] for e in entries).encode()).hexdigest()
+
+class YouTubeApi:
+    def __init__(self, base=YOUTUBE_API_BASE, token_file=YOUTUBE_TOKEN_FILE):
+        self.base = base.rstrip("/")
+        self.token_file = token_file
+        # token.json as written by google-auth (see development/get_token.py)
+        self.credentials = read_json(token_file) or {}
+        self.token = os.environ.get("TUNESHELL_YOUTUBE_TOKEN") or self.credentials.get('token')
+
+    def request(self, method, path, params, body=None, etag=None, retry=True):
+        # returns (status, data); a 304 comes back as (304, None)
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if etag:
+            headers['If-None-Match'] = etag
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(f"{self.base}/{path}?{urlencode(params)}", data=data,
+                                         headers=headers, method=method)
+        try:
+            with metrics.timer('sync.request'), urllib.request.urlopen(request, timeout=15) as response:
+                payload = response.read()
+                return response.status, json.loads(payload) if payload else None
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, None
+            if e.code == 401 and retry and self._refresh():
+                return self.request(method, path, params, body, etag, retry=False)
+            raise SyncError(f"YouTube API {method} {path} failed with {e.code}") from e
+        except OSError as e:
+            raise SyncError(f"YouTube API unreachable: {e}") from e
+
+    def _refresh(self):
+        creds = self.credentials
+        if not all(creds.get(k) for k in ('refresh_token', 'client_id', 'client_secret')):
+            return False
+        form = urlencode({
+            'grant_type': 'refresh_token',
+            'refresh_token': creds['refresh_token'],
+            'client_id': creds['client_id'],
+            'client_secret': creds['client_secret'],
+        }).encode()
+        token_uri = creds.get('token_uri', 'https://oauth2.googleapis.com/token')
+        try:
+            with urllib.request.urlopen(token_uri, data=form, timeout=15) as response:
+                self.token = json.load(response)['access_token']
+        except (OSError, ValueError, KeyError):
+            return False
+        creds['token'] = self.token
+        write_atomic(self.token_file, json.dumps(creds))
+        return True
+
+    def page(self, playlist_id, token, etag=None):
+        params = {'part': 'snippet', 'playlistId': playlist_id, 'maxResults': PAGE_SIZE}
+        if token:
+            params['pageToken'] = token
+        status, data = self.request('GET', 'playlistItems', params, etag=etag)
+        if status == 304:
+            return None
+        items = []
+        for it in data.get('items') or []:
+            snippet = it['snippet']
+            items.append({'item_id': it['id'], 'id': snippet['resourceId']['videoId'], 'title': snippet.get('title')})
+        return {'token': token, 'etag': data.get('etag'), 'next': data.get('nextPageToken'), 'items': items}
+
+    def insert(self, playlist_id, video_id):
+        body = {'snippet': {'playlistId': playlist_id, 'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}
+        _, data = self.request('POST', 'playlistItems', {'part': 'snippet'}, body=body)
+        return data['id']
+
+    def delete(self, item_id):
+        self.request('DELETE', 'playlistItems', {'id': item_id})
+
+def state_path(name):
+    return os.path.join(SYNC_DIR, name + ".json")
+
+def linked_playlist(name):
+    return (read_json(state_path(name)) or {}).get('playlist_id')
+
+def fetch_pages(api, playlist_id, stored):
+    # every page we have seen is revalidated at once with its ETag; unchanged
+    # pages cost a 304 and are reused, the rest of the chain is fetched as found
+    with ThreadPoolExecutor(max_workers=REVALIDATE_WORKERS) as pool:
+        fresh = list(pool.map(lambda p: api.page(playlist_id, p['token'], p['etag']), stored))
+    pages = []
+    reused = 0
+    token = ""
+    while token is not None:
+        i = len(pages)
+        if i < len(stored) and stored[i]['token'] == token:
+            page = fresh[i] or stored[i]
+            reused += fresh[i] is None
+        else:
+            page = api.page(playlist_id, token)
+        pages.append(page)
+        token = page['next']
+    return pages, reused
+
+def _entry(item):
+    return {'title': item['title'] or item['id'], 'id': item['id'], 'url': f"https://www.youtube.com/watch?v={item['id']}"}
+
+def sync_playlist(name, playlist_id, api=None):
+    # three-way merge against the ids both sides had after the last sync:
+    # additions and removals on either side are applied to the other
+    try:
+        return _sync(name, playlist_id, api or YouTubeApi())
+    except (ValueError, KeyError, AttributeError, TypeError) as e:
+        # a corrupt playlist or sync file, or an API response not shaped as expected
+        raise SyncError(f"unexpected data: {e!r}") from e
+    except OSError as e:
+        raise SyncError(f"{name}: {e}") from e
+
+def _sync(name, playlist_id, api):
+    state = read_json(state_path(name)) or {}
+    if state.get('playlist_id') != playlist_id:
+        state = {'playlist_id': playlist_id}
+    local = load_playlist(name)
+    local_hash = content_hash(local)
+
+    pages, reused = fetch_pages(api, playlist_id, state.get('pages', []))
+    remote = [it for page in pages for it in page['items'] if it['title'] not in UNAVAILABLE_TITLES]
+    remote_ids = {it['id'] for it in remote}
+    base = set(state.get('base', []))
+    # local files can't go to YouTube, they just stay where they are
+    local_ids = {e['id'] for e in local if e.get('source', 'youtube') == 'youtube'}
+
+    pull_add = [it for it in remote if it['id'] not in base and it['id'] not in local_ids]
+    pull_remove = (base - remote_ids) & local_ids
+    push_add = [e for e in local if e['id'] in local_ids and e['id'] not in base and e['id'] not in remote_ids]
+    push_remove = [it for it in remote if it['id'] in base and it['id'] not in local_ids]
+
+    for e in push_add:
+        api.insert(playlist_id, e['id'])
+    for it in push_remove:
+        api.delete(it['item_id'])
+
+    pulled = [_entry(it) for it in pull_add]
+    merged = [e for e in local if e['id'] not in pull_remove] + pulled
+    wrote = content_hash(merged) != local_hash
+    if wrote:
+        save_playlist(name, merged)
+    state.update({
+        'pages': pages,
+        'base': sorted({e['id'] for e in merged if e.get('source', 'youtube') == 'youtube'}),
+    })
+    os.makedirs(SYNC_DIR, exist_ok=True)
+    write_atomic(state_path(name), json.dumps(state))
+    return {
+        'pages': len(pages), 'reused': reused,
+        'pulled': len(pull_add), 'dropped': len(pull_remove),
+        'pushed': len(push_add), 'deleted': len(push_remove),
+        'wrote': wrote, 'entries': merged, 'added': pulled, 'removed': sorted(pull_remove),
+    }